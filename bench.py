@@ -0,0 +1,152 @@
+"""Load test for the registration flow.
+
+Each virtual user walks the same path a visitor does:
+homepage -> /modal/join-online -> POST /participants/online -> /registration-confirmed
+
+Run against the app in-process (default) or a running server (--url), e.g.
+
+    python bench.py --users 50 --iterations 20
+    python bench.py --db postgresql://localhost/mfi_bench --users 100
+    python bench.py --url http://localhost:5001 --users 100
+    MFI_SQLITE_PROFILE=0 python bench.py  # SQLite without WAL/pragmas/single writer, for comparison
+
+Every virtual user shares one client IP, so the in-process run lifts the per-IP
+rate limit (MFI_IP_RATE/MFI_IP_BURST) unless they are set explicitly; otherwise
+most POSTs would measure the limiter, not the app. Start a server under test
+(--url) with the same overrides, e.g. MFI_IP_RATE=1000000 MFI_IP_BURST=1000000.
+
+Results are printed per route and written as JSON to bench_results/ so runs can be
+compared across commits.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime
+
+import httpx
+
+HX = {"HX-Request": "true"}
+# The registration POST answers 200 with an error fragment when it fails; only the
+# confirmation step (which links on to /registration-confirmed) means it went through
+REGISTERED_MARKER = 'hx-get="/registration-confirmed'
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    k = (len(ordered) - 1) * pct / 100
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+async def timed(client, timings, route, method, url, expect=None, **kwargs):
+    """Requests `url`, recording (latency, succeeded); `expect` is text a good response must contain."""
+    start = time.perf_counter()
+    resp = await client.request(method, url, **kwargs)
+    ok = resp.status_code < 400 and (expect is None or expect in resp.text)
+    timings[route].append((time.perf_counter() - start, ok))
+    return resp
+
+
+async def virtual_user(client, timings, run_id, user, iterations):
+    for i in range(iterations):
+        email = f"bench-{run_id}-{user}-{i}@example.com"
+        name = f"Bench User {user}"
+        await timed(client, timings, "GET /", "GET", "/")
+        await timed(client, timings, "GET /modal/join-online", "GET", "/modal/join-online", headers=HX)
+        await timed(client, timings, "POST /participants/online", "POST", "/participants/online",
+                    expect=REGISTERED_MARKER, headers=HX,
+                    data={"name": name, "email": email, "phone": "9999999999", "address": ""})
+        await timed(client, timings, "GET /registration-confirmed", "GET", "/registration-confirmed", headers=HX,
+                    params={"name": name, "email": email})
+
+
+def make_client(args):
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    if args.url:
+        return httpx.AsyncClient(base_url=args.url, limits=limits, timeout=60)
+    # In-process: point the app at the requested database before importing it
+    if args.db:
+        os.environ["POSTGRES_MFI"] = args.db
+    os.environ.setdefault("MFI_IP_RATE", "1000000")
+    os.environ.setdefault("MFI_IP_BURST", "1000000")
+    import main
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench", timeout=60)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def summarize(timings, elapsed):
+    routes = {}
+    for route, samples in timings.items():
+        latencies = [s[0] * 1000 for s in samples]
+        routes[route] = {
+            "requests": len(samples),
+            "errors": sum(1 for _, ok in samples if not ok),
+            "throughput_rps": len(samples) / elapsed,
+            "mean_ms": statistics.fmean(latencies),
+            "p50_ms": percentile(latencies, 50),
+            "p95_ms": percentile(latencies, 95),
+            "p99_ms": percentile(latencies, 99),
+        }
+    return routes
+
+
+async def run(args):
+    timings = defaultdict(list)
+    run_id = uuid.uuid4().hex[:8]
+    async with make_client(args) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*[virtual_user(client, timings, run_id, u, args.iterations) for u in range(args.users)])
+        elapsed = time.perf_counter() - start
+
+    registered = sum(1 for _, ok in timings["POST /participants/online"] if ok)
+    target = args.url or "in-process"
+    db = "remote" if args.url else (args.db or os.getenv("POSTGRES_MFI", "sqlite:///./default_mfi.db"))
+    result = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "target": target,
+        "database": db.split("@")[-1], # Keep credentials out of the results file
+        "users": args.users,
+        "iterations": args.iterations,
+        "elapsed_s": elapsed,
+        "registered": registered,
+        "flows_per_s": registered / elapsed, # Completed registrations only; failed flows don't count
+        "routes": summarize(timings, elapsed),
+    }
+
+    print(f"{target} | db={result['database']} | {args.users} users x {args.iterations} flows in {elapsed:.2f}s, "
+          f"{registered} registered ({result['flows_per_s']:.1f} flows/s)")
+    print(f"{'route':<32}{'req':>7}{'err':>6}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}")
+    for route, r in result["routes"].items():
+        print(f"{route:<32}{r['requests']:>7}{r['errors']:>6}{r['throughput_rps']:>9.1f}"
+              f"{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['p99_ms']:>9.2f}")
+
+    os.makedirs(args.out, exist_ok=True)
+    path = os.path.join(args.out, f"{result['timestamp'].replace(':', '')}-{result['commit']}.json")
+    with open(path, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"Saved {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=20, help="Concurrent virtual users")
+    parser.add_argument("--iterations", type=int, default=10, help="Registration flows per user")
+    parser.add_argument("--url", help="Benchmark a running server instead of the in-process app")
+    parser.add_argument("--db", help="Database URL for the in-process app (defaults to POSTGRES_MFI or SQLite)")
+    parser.add_argument("--out", default="bench_results", help="Directory for JSON results")
+    asyncio.run(run(parser.parse_args()))
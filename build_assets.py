@@ -0,0 +1,123 @@
+"""Fingerprint and precompress everything under static/.
+
+Run after `npm run build:css`. Each asset is copied to static/dist/ with a content
+hash in its name (img/reasons.svg -> img/reasons.1a2b3c4d5e.svg). Text assets also
+get .gz and .br siblings. static/dist/manifest.json maps the original URL to the
+fingerprinted one; main.py's asset_url() reads it when the app starts.
+
+Raster images under static/img are also resized into WebP and PNG width variants,
+listed in static/dist/images.json for main.py's responsive_img().
+"""
+import gzip
+import hashlib
+import io
+import json
+import os
+import shutil
+
+try:
+    import brotli
+except ImportError: # Brotli variants are skipped; gzip still works everywhere
+    brotli = None
+
+try:
+    from PIL import Image
+except ImportError: # Without Pillow pages fall back to the original images
+    Image = None
+
+STATIC_DIR = "static"
+DIST_DIR = os.path.join(STATIC_DIR, "dist")
+MANIFEST = os.path.join(DIST_DIR, "manifest.json")
+IMAGE_VARIANTS = os.path.join(DIST_DIR, "images.json")
+SKIP = {"input.css", ".DS_Store"}
+COMPRESSIBLE = {".css", ".js", ".svg", ".json", ".txt", ".html"}
+RASTER = {".png", ".jpg", ".jpeg"}
+VARIANT_WIDTHS = (320, 640, 1024, 1600) # Never upscaled; the original width is always included
+
+
+def fingerprint(data):
+    return hashlib.sha256(data).hexdigest()[:10]
+
+
+def write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def write_compressed(path, data):
+    """Writes .gz/.br siblings of `path`, keeping only those that are actually smaller."""
+    gz = gzip.compress(data, compresslevel=9, mtime=0)
+    if len(gz) < len(data):
+        write(path + ".gz", gz)
+    if brotli is not None:
+        br = brotli.compress(data, quality=11)
+        if len(br) < len(data):
+            write(path + ".br", br)
+
+
+def add_asset(manifest, rel_path, data):
+    """Writes a fingerprinted copy of `data` under DIST_DIR and records it in the manifest."""
+    stem, ext = os.path.splitext(rel_path)
+    hashed = f"{stem}.{fingerprint(data)}{ext}"
+    out = os.path.join(DIST_DIR, hashed)
+    write(out, data)
+    if ext.lower() in COMPRESSIBLE:
+        write_compressed(out, data)
+    manifest[f"/{STATIC_DIR}/{rel_path}"] = f"/{DIST_DIR}/{hashed}"
+    return out
+
+
+def encode(image, fmt):
+    buf = io.BytesIO()
+    if fmt == "webp":
+        image.save(buf, "WEBP", quality=80, method=6)
+    else:
+        image.save(buf, "PNG", optimize=True)
+    return buf.getvalue()
+
+
+def add_image_variants(manifest, rel_path, data):
+    """Writes resized WebP/PNG copies of a raster image; returns its images.json entry."""
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA")
+    width, height = image.size
+    entry = {"width": width, "height": height, "webp": [], "png": []}
+    stem = os.path.splitext(rel_path)[0]
+    for w in sorted({w for w in VARIANT_WIDTHS if w < width * 0.9} | {width}):
+        resized = image if w == width else image.resize((w, round(height * w / width)), Image.LANCZOS)
+        for fmt in ("webp", "png"):
+            add_asset(manifest, f"{stem}-{w}w.{fmt}", encode(resized, fmt))
+            entry[fmt].append([manifest[f"/{STATIC_DIR}/{stem}-{w}w.{fmt}"], w])
+    return entry
+
+
+def build():
+    shutil.rmtree(DIST_DIR, ignore_errors=True)
+    manifest, variants = {}, {}
+    for root, dirs, files in os.walk(STATIC_DIR):
+        dirs[:] = [d for d in dirs if os.path.join(root, d) != DIST_DIR]
+        for name in sorted(files):
+            if name in SKIP:
+                continue
+            src = os.path.join(root, name)
+            rel_path = os.path.relpath(src, STATIC_DIR).replace(os.sep, "/")
+            with open(src, "rb") as f:
+                data = f.read()
+            add_asset(manifest, rel_path, data)
+            if Image is not None and os.path.splitext(name)[1].lower() in RASTER:
+                variants[f"/{STATIC_DIR}/{rel_path}"] = add_image_variants(manifest, rel_path, data)
+
+    write(MANIFEST, json.dumps(manifest, indent=2, sort_keys=True).encode())
+    write(IMAGE_VARIANTS, json.dumps(variants, indent=2, sort_keys=True).encode())
+    return manifest, variants
+
+
+if __name__ == "__main__":
+    manifest, variants = build()
+    notes = [n for n, missing in (("brotli not installed, gzip only", brotli is None),
+                                   ("Pillow not installed, no image variants", Image is None)) if missing]
+    print(f"Fingerprinted {len(manifest)} assets ({len(variants)} images with variants) into {DIST_DIR}"
+          + (f" ({'; '.join(notes)})" if notes else ""))
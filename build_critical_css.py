@@ -0,0 +1,259 @@
+"""Extract per-page critical CSS from the built stylesheet.
+
+Run after build_assets.py (which clears static/dist/). Each cached page is
+rendered in-process, the class names it uses are collected from its HTML, and
+static/output.css is trimmed down to the rules those classes can match plus the
+global rules (preflight, theme variables, @property) every page needs.
+static/dist/critical.json maps the page path to its trimmed CSS; main.py inlines
+it into the page head and loads the full stylesheet without blocking rendering.
+
+Classes that only appear at runtime (added by scripts or swapped in by HTMX) are
+not seen here; the full stylesheet covers them once it has loaded.
+"""
+import json
+import os
+import re
+from html.parser import HTMLParser
+
+os.environ.setdefault("POSTGRES_MFI", "sqlite://") # In-memory; nothing is written
+
+STYLESHEET = os.path.join("static", "output.css")
+CRITICAL = os.path.join("static", "dist", "critical.json")
+# At-rules whose contents are ordinary rules to filter; any other block at-rule
+# (@property, @font-face, ...) is kept whole, @keyframes only if referenced
+CONDITIONAL_AT_RULES = {"@media", "@supports", "@layer", "@container", "@scope", "@starting-style"}
+
+CLASS_RE = re.compile(r"\.((?:\\[0-9a-fA-F]{1,6}\s?|\\.|[\w-])+)")
+ESCAPE_RE = re.compile(r"\\([0-9a-fA-F]{1,6}\s?|.)")
+PSEUDO_FUNCTION_RE = re.compile(r"::?([\w-]+)\(")
+
+
+class ClassCollector(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.classes = set()
+
+    def handle_starttag(self, tag, attrs):
+        for name, value in attrs:
+            if name == "class" and value:
+                self.classes.update(value.split())
+
+
+def page_classes(html):
+    collector = ClassCollector()
+    collector.feed(html)
+    collector.close()
+    return collector.classes
+
+
+def skip_string(css, i):
+    """Returns the index of the quote closing the string that starts at `i`."""
+    quote, i = css[i], i + 1
+    while i < len(css) and css[i] != quote:
+        i += 2 if css[i] == "\\" else 1
+    return i
+
+
+def parse(css, i=0):
+    """Parses `css` from `i` into declarations/statements (str) and blocks
+    ((prelude, children)), up to the matching close brace.
+
+    Returns (nodes, index after the close brace). Strings, comments and
+    parentheses (e.g. unquoted data: URLs) are skipped so a ';' or '{' inside
+    them doesn't split anything.
+    """
+    nodes, start, depth = [], i, 0
+    while i < len(css):
+        c = css[i]
+        if c == "\\":
+            i += 1
+        elif c in "\"'":
+            i = skip_string(css, i)
+        elif css.startswith("/*", i):
+            end = css.find("*/", i + 2)
+            if css[start:i].strip() == "":
+                start = len(css) if end < 0 else end + 2 # Drop comments between statements
+            i = len(css) if end < 0 else end + 1
+        elif c == "(":
+            depth += 1
+        elif c == ")":
+            depth = max(depth - 1, 0)
+        elif depth:
+            pass
+        elif c == ";":
+            if css[start:i].strip():
+                nodes.append(css[start:i].strip())
+            start = i + 1
+        elif c == "{":
+            prelude = css[start:i].strip()
+            children, i = parse(css, i + 1)
+            nodes.append((prelude, children))
+            start = i
+            continue
+        elif c == "}":
+            if css[start:i].strip():
+                nodes.append(css[start:i].strip())
+            return nodes, i + 1
+        i += 1
+    if css[start:].strip():
+        nodes.append(css[start:].strip())
+    return nodes, i
+
+
+def serialize(nodes):
+    out = []
+    for i, node in enumerate(nodes):
+        if isinstance(node, tuple):
+            out.append(f"{node[0]}{{{serialize(node[1])}}}")
+        else: # A block's last declaration needs no ';'
+            out.append(node if i == len(nodes) - 1 else node + ";")
+    return "".join(out)
+
+
+def split_top_level(text, sep=","):
+    """Splits `text` on `sep` outside parentheses, brackets, strings and escapes."""
+    parts, start, depth, i = [], 0, 0, 0
+    while i < len(text):
+        c = text[i]
+        if c == "\\":
+            i += 1
+        elif c in "\"'":
+            i = skip_string(text, i)
+        elif c in "([":
+            depth += 1
+        elif c in ")]":
+            depth -= 1
+        elif c == sep and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+        i += 1
+    parts.append(text[start:])
+    return [p.strip() for p in parts if p.strip()]
+
+
+def closing_paren(text, i):
+    """Returns the index of the ')' matching the '(' just before `i`."""
+    depth = 1
+    while i < len(text):
+        c = text[i]
+        if c == "\\":
+            i += 1
+        elif c in "\"'":
+            i = skip_string(text, i)
+        elif c == "(":
+            depth += 1
+        elif c == ")":
+            depth -= 1
+            if depth == 0:
+                return i
+        i += 1
+    return i
+
+
+def required_part(selector):
+    """The parts of `selector` an element must satisfy for it to match.
+
+    :not() arguments are dropped (they match by absence), as are argument lists
+    with alternatives (:is(.a, .b) needs only one of them).
+    """
+    out, i = [], 0
+    while i < len(selector):
+        m = PSEUDO_FUNCTION_RE.match(selector, i)
+        if m:
+            end = closing_paren(selector, m.end())
+            inner = selector[m.end():end]
+            if m.group(1) != "not" and len(split_top_level(inner)) == 1:
+                out.append(" " + required_part(inner) + " ")
+            i = end + 1
+        elif selector[i] == "\\":
+            out.append(selector[i:i + 2])
+            i += 2
+        else:
+            out.append(selector[i])
+            i += 1
+    return "".join(out)
+
+
+def unescape(name):
+    def replace(m):
+        seq = m.group(1)
+        if len(seq) > 1 or seq in "0123456789abcdefABCDEF":
+            return chr(int(seq.strip(), 16))
+        return seq
+    return ESCAPE_RE.sub(replace, name)
+
+
+def selector_classes(selector):
+    return {unescape(name) for name in CLASS_RE.findall(required_part(selector))}
+
+
+def trim(nodes, classes):
+    """Keeps the rules of `nodes` whose selectors can match an element using `classes`."""
+    kept = []
+    for node in nodes:
+        if isinstance(node, str):
+            kept.append(node)
+            continue
+        prelude, children = node
+        if prelude.startswith("@"):
+            name = prelude.split(None, 1)[0].lower()
+            if name in CONDITIONAL_AT_RULES:
+                children = trim(children, classes)
+                if children:
+                    kept.append((prelude, children))
+            else:
+                kept.append(node)
+            continue
+        selectors = [s for s in split_top_level(prelude) if selector_classes(s) <= classes]
+        if selectors: # Nested rules (&:hover, @media inside) are variants of a kept rule: keep them all
+            kept.append((",".join(selectors), children))
+    return kept
+
+
+def drop_unused_keyframes(nodes, used_text):
+    kept = []
+    for node in nodes:
+        if isinstance(node, tuple):
+            prelude, children = node
+            words = prelude.split()
+            if words and words[0].lower().endswith("keyframes"):
+                if len(words) > 1 and re.search(rf"(?<![\w-]){re.escape(words[1])}(?![\w-])", used_text):
+                    kept.append(node)
+                continue
+            node = (prelude, drop_unused_keyframes(children, used_text))
+        kept.append(node)
+    return kept
+
+
+def critical_css(nodes, classes):
+    trimmed = trim(nodes, classes)
+    without_keyframes = serialize(drop_unused_keyframes(trimmed, ""))
+    return serialize(drop_unused_keyframes(trimmed, without_keyframes))
+
+
+def build():
+    import main
+    from starlette.testclient import TestClient
+
+    with open(STYLESHEET, encoding="utf-8") as f:
+        nodes, _ = parse(f.read())
+    # Render the pages as they look without critical CSS, whatever an earlier build left behind
+    main.critical_css.clear()
+    client = TestClient(main.app)
+    critical = {}
+    for path in main.CACHED_PAGE_PATHS:
+        resp = client.get(path)
+        if resp.status_code == 200 and main.STYLESHEET_TAG in resp.text: # Full pages only
+            critical[path] = critical_css(nodes, page_classes(resp.text))
+
+    os.makedirs(os.path.dirname(CRITICAL), exist_ok=True)
+    with open(CRITICAL, "w", encoding="utf-8") as f:
+        json.dump(critical, f, indent=2, sort_keys=True)
+    return critical, len(serialize(nodes))
+
+
+if __name__ == "__main__":
+    critical, full_size = build()
+    for path, css in sorted(critical.items()):
+        print(f"{path:<20}{len(css):>8} bytes ({len(css) / full_size:.0%} of {full_size})")
+    print(f"Wrote critical CSS for {len(critical)} pages to {CRITICAL}")
@@ -0,0 +1,21 @@
+"""Bulk-import participants from a partner CSV into online_participants.
+
+    python import_participants.py partners.csv [--chunk-size 5000]
+
+The CSV needs a header row with name, email and phone columns (address is
+optional). Uses the database from POSTGRES_MFI, like the app.
+"""
+import argparse
+import json
+
+from main import IMPORT_CHUNK_SIZE, import_participants
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("csv_file", help="CSV file to import")
+    parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE, help="Rows written per transaction")
+    args = parser.parse_args()
+
+    with open(args.csv_file, encoding="utf-8-sig", newline="") as f:
+        summary = import_participants(f, chunk_size=args.chunk_size)
+    print(json.dumps(summary, indent=2))
@@ -0,0 +1,85 @@
+"""Production launcher: prepare the database once, then serve with several workers.
+
+    WEB_CONCURRENCY=4 MFI_DB_MAX_CONNECTIONS=40 python launch.py
+
+- The schema step (init_db) runs once here, before any worker starts; workers are
+  told to skip it.
+- Workers are separate uvicorn processes. Each imports main itself and so builds
+  its own engine, with MFI_DB_MAX_CONNECTIONS split evenly between them.
+- The outbox email dispatcher runs in this supervising process only, so workers
+  never compete for the same outbox rows. Its poller and MFI_EMAIL_WORKERS threads
+  get their own small pool, taken off the budget before the workers' split.
+- Each worker needs at least two connections, so WEB_CONCURRENCY is capped (with a
+  warning) at what is left of the budget // 2 rather than overrunning it.
+- `kill -USR1 <launcher pid>` (or POST /admin/cache/invalidate on any worker) clears
+  the page cache of every worker.
+- Every process writes its metrics to MFI_METRICS_DIR (a fresh temporary directory
+  unless set), so /metrics on any worker reports all of them, labelled by worker.
+"""
+import glob
+import os
+import shutil
+import signal
+import tempfile
+
+import uvicorn
+from uvicorn.supervisors import Multiprocess
+
+MIN_CONNECTIONS_PER_WORKER = 2 # Same floor as main's per-worker pool split
+
+def available_cpus():
+    try:
+        return len(os.sched_getaffinity(0)) # Honours container/cpuset limits, unlike os.cpu_count()
+    except AttributeError:
+        return os.cpu_count() or 1
+
+def worker_count():
+    requested = int(os.getenv("WEB_CONCURRENCY", str(available_cpus())))
+    budget = int(os.getenv("MFI_DB_MAX_CONNECTIONS", "15"))
+    reserved = 1 + int(os.getenv("MFI_EMAIL_WORKERS", "2")) # This process's dispatcher, as in main
+    allowed = max(1, (budget - reserved) // MIN_CONNECTIONS_PER_WORKER)
+    if requested > allowed:
+        print(f"Warning: {requested} workers would need more than MFI_DB_MAX_CONNECTIONS={budget} connections "
+              f"({reserved} are kept for the email dispatcher); starting {allowed}. Raise MFI_DB_MAX_CONNECTIONS to run more.")
+        return allowed
+    return requested
+
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "5001"))
+
+if __name__ == "__main__":
+    WORKERS = worker_count()
+    # Visible to main on import here and inherited by every worker process
+    os.environ["MFI_WORKERS"] = str(WORKERS)
+    os.environ["MFI_EMAIL_DISPATCHER"] = "0"
+    os.environ["MFI_LAUNCHER_PID"] = str(os.getpid())
+    own_metrics_dir = not os.getenv("MFI_METRICS_DIR")
+    if own_metrics_dir:
+        os.environ["MFI_METRICS_DIR"] = tempfile.mkdtemp(prefix="mfi-metrics-")
+    metrics_dir = os.environ["MFI_METRICS_DIR"]
+    os.makedirs(metrics_dir, exist_ok=True)
+    for stale in glob.glob(os.path.join(metrics_dir, "*.prom")): # Left over from a previous run
+        os.remove(stale)
+
+    import main # Runs init_db once for this deployment
+
+    os.environ["MFI_SKIP_SCHEMA_INIT"] = "1"
+
+    # uvicorn's supervisor traps SIGUSR1 and calls handle_usr1() if it has one; pass it on
+    # to every worker. With a single worker uvicorn serves from this process instead,
+    # which keeps main's own handler.
+    def forward_usr1(supervisor):
+        for process in supervisor.processes:
+            if process.pid:
+                os.kill(process.pid, signal.SIGUSR1)
+    Multiprocess.handle_usr1 = forward_usr1
+    if main.email_dispatcher is not None:
+        main.email_dispatcher.start()
+    try:
+        uvicorn.run("main:app", host=HOST, port=PORT, workers=WORKERS,
+                    proxy_headers=True, forwarded_allow_ips=os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1"))
+    finally:
+        if main.email_dispatcher is not None:
+            main.email_dispatcher.stop()
+        if own_metrics_dir:
+            shutil.rmtree(metrics_dir, ignore_errors=True)
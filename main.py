@@ -1,9 +1,81 @@
+import time
+BOOT_STARTED = time.perf_counter() # Taken before the heavy imports below so startup timing covers them
+
+import asyncio
+import base64
+import concurrent.futures
+import contextvars
+import bisect
+import csv
+import fcntl
+import glob
+import io
+import functools
+import itertools
+import gzip
+import hashlib
+import html
+import inspect
+import json
 import logging
+import math
+import mimetypes
+import queue
+import re
+import secrets
+import signal
+import smtplib
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
 from typing import Optional
-from datetime import datetime
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from html.parser import HTMLParser
 from fasthtml.common import *
-from sqlmodel import SQLModel, Field, create_engine, Session # Added SQLModel imports
-from sqlalchemy.exc import IntegrityError # To catch potential DB errors like duplicates
+from sqlmodel import SQLModel, Field, create_engine, Session, select # Added SQLModel imports
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy import Index, and_, event, func, or_, text, tuple_, update
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError, IntegrityError, InterfaceError, OperationalError, TimeoutError as PoolTimeoutError # To catch potential DB errors like duplicates
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.schema import CreateIndex
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from starlette.middleware.gzip import GZipMiddleware
+
+try:
+    import brotli
+except ImportError: # Cached pages are then offered with gzip only
+    brotli = None
+
+# --- Startup Timing ---
+# Cold starts matter on every deploy and autoscale event, so each phase of process
+# start is timed, printed once the app is ready and exported on /metrics.
+
+class StartupTimer:
+    def __init__(self, started):
+        self.started = self.mark = started
+        self.phases = OrderedDict() # phase -> seconds, in the order they ran
+
+    def lap(self, phase):
+        """Records the time since the previous lap (or process start) as `phase`."""
+        now = time.perf_counter()
+        self.phases[phase] = now - self.mark
+        self.mark = now
+
+    def summary(self):
+        return ", ".join(f"{phase} {seconds * 1000:.0f}ms" for phase, seconds in self.phases.items())
+
+    def metrics(self):
+        lines = ["# HELP mfi_startup_seconds Time spent in each phase of process startup.",
+                 "# TYPE mfi_startup_seconds gauge"]
+        lines += [f'mfi_startup_seconds{{phase="{phase}"}} {seconds}' for phase, seconds in self.phases.items()]
+        return lines
+
+startup = StartupTimer(BOOT_STARTED)
+startup.lap("imports")
 
 def checkmark_svg():
     """Returns an SVG checkmark icon using FastHTML Svg and Path components."""
@@ -60,20 +132,29 @@ toggle_script = Script("""
 
 
 close_modal_script = Script("""
+// Closes the join modal entirely in the browser (no request to the server)
+function closeJoinModal(fade) {
+  const modal = document.getElementById('join-modal-container');
+  if (!modal) {
+      console.log('Modal container #join-modal-container not found'); // Optional: for debugging
+      return;
+  }
+  if (!fade) {
+      modal.remove();
+      return;
+  }
+  // Add a fade-out effect before removing
+  modal.style.transition = 'opacity 0.5s ease-out';
+  modal.style.opacity = '0';
+  setTimeout(() => { modal.remove(); }, 500); // Remove after fade
+}
+
 document.addEventListener('DOMContentLoaded', (event) => {
   // Ensure body exists before adding listener
   if (document.body) {
       document.body.addEventListener('closeModal', function(evt) {
           console.log('closeModal event received, closing modal.'); // Optional: for debugging
-          const modal = document.getElementById('join-modal-container');
-          if (modal) {
-              // Add a fade-out effect before removing (optional)
-              modal.style.transition = 'opacity 0.5s ease-out';
-              modal.style.opacity = '0';
-              setTimeout(() => { modal.remove(); }, 500); // Remove after fade
-          } else {
-              console.log('Modal container #join-modal-container not found'); // Optional: for debugging
-          }
+          closeJoinModal(true);
       });
   } else {
       console.error('Document body not found when trying to attach closeModal listener.');
@@ -81,19 +162,597 @@ document.addEventListener('DOMContentLoaded', (event) => {
 });
 """)
 
+# --- Static Assets ---
+# build_assets.py copies static/ into static/dist/ with content hashes in the file
+# names and precompressed .gz/.br siblings. When its manifest exists, asset_url()
+# points pages at the fingerprinted copies, which can be cached forever.
+
+ASSET_DIST_DIR = os.path.abspath(os.path.join("static", "dist"))
+ASSET_DIST_PREFIX = "/static/dist/"
+
+def load_asset_manifest(path=os.path.join(ASSET_DIST_DIR, "manifest.json")):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError: # Assets not built (local dev): serve the originals
+        return {}
+
+asset_manifest = load_asset_manifest()
+image_variants = load_asset_manifest(os.path.join(ASSET_DIST_DIR, "images.json"))
+
+def asset_url(path):
+    """Returns the fingerprinted URL for a static file, or `path` itself if it wasn't built."""
+    return asset_manifest.get("/" + path.lstrip("/"), path)
+
+MD_MEDIA = "(min-width: 768px)" # Tailwind's md breakpoint
+
+def _variant_srcsets(path, sizes):
+    """Returns (webp srcset, png srcset, sizes) for a built image, or Nones if it has no variants."""
+    variants = image_variants.get("/" + path.lstrip("/"))
+    if not variants:
+        return None, None, None
+    webp, png = (", ".join(f"{url} {width}w" for url, width in variants[fmt]) for fmt in ("webp", "png"))
+    # Without `sizes` the browser assumes 100vw; default to the image's natural width instead
+    return webp, png, sizes or f"{variants['width']}px"
+
+def responsive_img(src, desktop_src=None, sizes=None, **kwargs):
+    """An Img wrapped in <picture> so each device downloads a single, right-sized file.
+
+    `desktop_src` (optional) replaces `src` from the md breakpoint up, instead of
+    shipping two <img> tags and hiding one. WebP/PNG width variants from
+    build_assets.py are offered through srcset; `sizes` tells the browser how wide
+    the image renders.
+    """
+    sources = []
+    if desktop_src:
+        webp, png, desktop_sizes = _variant_srcsets(desktop_src, sizes)
+        if webp:
+            sources.append(Source(type="image/webp", srcset=webp, sizes=desktop_sizes, media=MD_MEDIA))
+        sources.append(Source(srcset=png or asset_url(desktop_src), sizes=desktop_sizes, media=MD_MEDIA))
+    webp, png, src_sizes = _variant_srcsets(src, sizes)
+    if webp:
+        sources.append(Source(type="image/webp", srcset=webp, sizes=src_sizes))
+    img = Img(src=asset_url(src), srcset=png, sizes=src_sizes, **kwargs)
+    return Picture(*sources, img) if sources else img
+
+def accepted_encodings(header):
+    """Parses Accept-Encoding into the set of codings the client allows (q > 0)."""
+    encodings = set()
+    for part in (header or "").split(","):
+        coding, *params = [p.strip() for p in part.split(";")]
+        q = next((p[2:] for p in params if p.startswith("q=")), "1")
+        try:
+            allowed = float(q) > 0
+        except ValueError:
+            allowed = False
+        if coding and allowed:
+            encodings.add(coding.lower())
+    return encodings
+
+class StaticAssetMiddleware:
+    """Serves static/dist/ with immutable caching, preferring prebuilt .br/.gz files."""
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(ASSET_DIST_PREFIX) or scope["method"] not in ("GET", "HEAD"):
+            return await self.app(scope, receive, send)
+
+        full_path = os.path.abspath(os.path.join(ASSET_DIST_DIR, scope["path"][len(ASSET_DIST_PREFIX):]))
+        if not full_path.startswith(ASSET_DIST_DIR + os.sep) or not os.path.isfile(full_path):
+            return await Response("404 Not Found", status_code=404)(scope, receive, send)
+
+        headers = {"cache-control": "public, max-age=31536000, immutable", "vary": "Accept-Encoding"}
+        media_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+        accepted = accepted_encodings(Headers(scope=scope).get("accept-encoding"))
+        for coding, suffix in (("br", ".br"), ("gzip", ".gz")):
+            if coding in accepted and os.path.isfile(full_path + suffix):
+                full_path += suffix
+                headers["content-encoding"] = coding
+                break
+        await FileResponse(full_path, media_type=media_type, headers=headers)(scope, receive, send)
+
+# --- Critical CSS ---
+# build_critical_css.py trims the stylesheet down to the rules each cached page
+# actually uses. Those pages get that CSS inlined in the head and load the full
+# stylesheet asynchronously (preload, switched to a stylesheet once it arrives),
+# so the first paint no longer waits for the whole Tailwind/DaisyUI bundle. Pages
+# without an entry, and dev setups that haven't run the build, keep the plain
+# render-blocking <link>.
+
+STYLESHEET_URL = asset_url("/static/output.css")
+stylesheet_link = Link(rel="stylesheet", href=STYLESHEET_URL, type="text/css")
+STYLESHEET_TAG = to_xml(stylesheet_link).strip()
+critical_css = load_asset_manifest(os.path.join(ASSET_DIST_DIR, "critical.json"))
+
+def deferred_stylesheet(css):
+    """Inline critical CSS plus a non-blocking load of the full stylesheet."""
+    return "".join(to_xml(tag).strip() for tag in (
+        Style(NotStr(css)),
+        Link(rel="preload", href=STYLESHEET_URL, onload="this.onload=null;this.rel='stylesheet'", **{"as": "style"}),
+        Noscript(stylesheet_link),
+    ))
+
+def inline_critical_css(path, body):
+    """Swaps the blocking stylesheet link in a rendered page for its critical CSS, if it has any."""
+    css = critical_css.get(path)
+    tag = STYLESHEET_TAG.encode()
+    if not css or tag not in body:
+        return body
+    return body.replace(tag, deferred_stylesheet(css).encode(), 1)
+
 hdrs = (
     Meta(name="viewport", content="width=device-width, initial-scale=1.0"),
     Meta(
         name="description",
         content="Fun and enriching yoga summer camp for kids in Bangalore. Combining mindfulness, movement, and play to nurture children's physical and emotional wellbeing. Ages 5-12."
     ),
-    Link(rel="stylesheet", href="/static/output.css", type="text/css"),
+    stylesheet_link,
+    # Swap 429/503 bodies too, so rate-limit and overload messages show up in the modal
+    Meta(name="htmx-config", content=json.dumps({"responseHandling": [
+        {"code": "204", "swap": False},
+        {"code": "[23]..", "swap": True},
+        {"code": "(429|503)", "swap": True, "error": True},
+        {"code": "[45]..", "swap": False, "error": True},
+    ]})),
     close_modal_script,
     toggle_script
 )
 
 app, rt = fast_app(hdrs=hdrs, pico=False, live=False)
 
+# --- Preload Hints ---
+# Full pages advertise their critical assets in `Link: rel=preload` headers (and,
+# with MFI_EARLY_HINTS=1 on a server that supports it, a 103 Early Hints response)
+# so the browser starts fetching the stylesheet and hero image before it has parsed
+# any HTML. The links are read off the rendered page: stylesheets and scripts from
+# the head, plus the above-the-fold images, i.e. those marked fetchpriority="high"
+# (or, on a page that marks none, its first non-lazy image).
+
+PRELOAD_IMAGES = int(os.getenv("MFI_PRELOAD_IMAGES", "1")) # Fallback count for pages with no marked image
+EARLY_HINTS = os.getenv("MFI_EARLY_HINTS", "").lower() in ("1", "true", "yes")
+
+class PreloadScanner(HTMLParser):
+    """Collects preload/preconnect Link header values from a page's HTML."""
+    def __init__(self, max_images=PRELOAD_IMAGES):
+        super().__init__()
+        self.links = []
+        self.max_images = max_images
+        self.in_body, self.sources = False, None
+        self.marked, self.unmarked = [], [] # Candidate images as (<picture> sources, <img> attrs)
+
+    def add(self, link):
+        if link not in self.links:
+            self.links.append(link)
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "body":
+            self.in_body = True
+        elif tag == "link" and attrs.get("href") and ("stylesheet" in (attrs.get("rel") or "").split()
+                                                     or attrs.get("as") == "style"): # Deferred stylesheet
+            self.add(f"<{attrs['href']}>; rel=preload; as=style")
+        elif tag == "script" and attrs.get("src"):
+            src = attrs["src"]
+            if src.startswith("/") and not src.startswith("//"):
+                self.add(f"<{src}>; rel=preload; as=script")
+            else: # Third-party script: warm up the connection, the tag itself is found early enough
+                scheme, _, rest = src.partition("//")
+                self.add(f"<{scheme}//{rest.split('/', 1)[0]}>; rel=preconnect")
+        elif tag == "picture":
+            self.sources = []
+        elif tag == "source" and self.sources is not None:
+            self.sources.append(attrs)
+        elif tag == "img" and self.in_body and attrs.get("loading") != "lazy" and attrs.get("src"):
+            (self.marked if attrs.get("fetchpriority") == "high" else self.unmarked).append((self.sources or [], attrs))
+
+    def handle_endtag(self, tag):
+        if tag == "picture":
+            self.sources = None
+
+    def close(self):
+        super().close()
+        for sources, img in self.marked or self.unmarked[:self.max_images]:
+            self.add_image(sources, img)
+
+    def add_image(self, sources, img):
+        # Mirror the browser's <picture> choice: the first source per media query, then the
+        # media-less catch-all (a trailing source, or the <img> itself) for every other viewport
+        seen_media = []
+        for source in sources + [img]:
+            media = source.get("media")
+            if media:
+                if media not in seen_media:
+                    seen_media.append(media)
+                    self.add(self.image_link(source, img, media))
+                continue
+            if len(seen_media) <= 1:
+                self.add(self.image_link(source, img, f"not all and {seen_media[0]}" if seen_media else None))
+            break
+
+    @staticmethod
+    def image_link(source, img, media):
+        link = f"<{source.get('src') or img['src']}>; rel=preload; as=image"
+        for attr, param in (("srcset", "imagesrcset"), ("sizes", "imagesizes"), ("type", "type")):
+            if source.get(attr):
+                link += f'; {param}="{source[attr]}"'
+        return link + (f'; media="{media}"' if media else "")
+
+def preload_links(page_html, max_images=PRELOAD_IMAGES):
+    scanner = PreloadScanner(max_images)
+    scanner.feed(page_html)
+    scanner.close()
+    return scanner.links
+
+# Known before any page renders, so even a cold cache miss can send Early Hints
+HDRS_PRELOAD_LINKS = preload_links(to_xml(hdrs), max_images=0)
+
+async def send_early_hints(scope, send, links):
+    if EARLY_HINTS and links and "http.response.early_hint" in scope.get("extensions", {}):
+        await send({"type": "http.response.early_hint", "links": [link.encode("latin-1") for link in links]})
+
+# Dynamic responses are gzipped per request; cached pages are compressed once in PageCache.
+# It sits innermost so it never sees precompressed static files or cached pages.
+app.add_middleware(GZipMiddleware, minimum_size=500)
+app.add_middleware(StaticAssetMiddleware)
+
+# --- Page Cache ---
+# The static pages below render the same markup on every request, so we render
+# each one once (on first hit) and serve the stored bytes with a strong ETag.
+# The cache lives in process memory, so a deploy/restart always starts clean.
+
+# Path -> Cache-Control. Pages always revalidate (a cheap 304). The join modal is
+# opened many times per visit, so browsers and CDNs may reuse it for a few minutes
+# without asking, then revalidate against its ETag.
+CACHED_PAGE_PATHS = {
+    "/": b"no-cache",
+    "/about-us": b"no-cache",
+    "/join-event": b"no-cache",
+    "/faq": b"no-cache",
+    "/modal/join-online": b"public, max-age=300, stale-while-revalidate=3600",
+}
+
+class PageCache:
+    """Stores rendered page bodies keyed by (host, path, htmx variant).
+
+    Host is client supplied, so the key space is bounded: past `max_entries` the
+    least recently used page is evicted, and junk hosts can only push each other out.
+    """
+    def __init__(self, paths, max_entries=64):
+        self.paths = set(paths)
+        self.cache_control = dict(paths) if isinstance(paths, dict) else {}
+        self.max_entries = max_entries
+        self.entries = OrderedDict() # key -> entry, least recently used first
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key, status, headers, body):
+        self.entries.pop(key, None)
+        while len(self.entries) >= self.max_entries:
+            self.entries.popitem(last=False)
+        entry = {
+            "status": status,
+            "headers": headers,
+            "body": body,
+            "etag": hashlib.sha256(body).hexdigest()[:32],
+            "encoded": {}, # Content-coding -> compressed body, filled on first use
+            # Full pages only; an HTMX fragment's assets are already loaded by the page it lands in
+            "links": [] if key[2] else preload_links(body.decode("utf-8", "replace")),
+        }
+        self.entries[key] = entry
+        return entry
+
+    def encoded_body(self, entry, coding):
+        """Returns the entry's body in `coding`, compressing at most once per cached version."""
+        if coding == "identity":
+            return entry["body"]
+        if coding not in entry["encoded"]:
+            entry["encoded"][coding] = PAGE_COMPRESSORS[coding](entry["body"])
+        return entry["encoded"][coding]
+
+    def invalidate(self, path=None):
+        """Drops every cached page, or only the variants of `path` if given."""
+        if path is None:
+            self.entries.clear()
+        else:
+            self.entries = OrderedDict((k, v) for k, v in self.entries.items() if k[1] != path)
+
+PAGE_COMPRESSORS = {"gzip": lambda body: gzip.compress(body, compresslevel=9, mtime=0)}
+if brotli is not None:
+    PAGE_COMPRESSORS["br"] = lambda body: brotli.compress(body, quality=11, mode=brotli.MODE_TEXT)
+
+def choose_encoding(accept_encoding):
+    """Picks the best content-coding we can serve for an Accept-Encoding header."""
+    accepted = accepted_encodings(accept_encoding)
+    for coding in ("br", "gzip"):
+        if coding in accepted and coding in PAGE_COMPRESSORS:
+            return coding
+    return "identity"
+
+page_cache = PageCache(CACHED_PAGE_PATHS)
+
+# Pages are otherwise only re-rendered after a restart or deploy. SIGUSR1 clears this
+# process's cache; POST /admin/cache/invalidate does it for every worker (under
+# launch.py by signalling the launcher, which forwards SIGUSR1 to each worker).
+if hasattr(signal, "SIGUSR1") and threading.current_thread() is threading.main_thread():
+    signal.signal(signal.SIGUSR1, lambda signum, frame: page_cache.invalidate())
+
+def is_htmx_fragment(headers):
+    # Same rule FastHTML uses to decide between a full page and an HTMX fragment
+    return "hx-request" in headers and "hx-history-restore-request" not in headers
+
+def _etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so ignore any W/ prefix
+    tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+    return etag in tags
+
+class PageCacheMiddleware:
+    """ASGI middleware that serves CACHED_PAGE_PATHS from `page_cache`."""
+    def __init__(self, app, cache):
+        self.app = app
+        self.cache = cache
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD") or scope["path"] not in self.cache.paths:
+            return await self.app(scope, receive, send)
+
+        req_headers = Headers(scope=scope)
+        is_fragment = is_htmx_fragment(req_headers)
+        key = (req_headers.get("host", ""), scope["path"], is_fragment)
+
+        entry = self.cache.get(key)
+        if entry is None:
+            if not is_fragment: # Let the browser start on the head assets while the page renders
+                await send_early_hints(scope, send, HDRS_PRELOAD_LINKS)
+            entry = await self._render(scope, receive, send, key)
+            if entry is None: # Response was not cacheable and has already been sent
+                return
+
+        coding = choose_encoding(req_headers.get("accept-encoding"))
+        body = self.cache.encoded_body(entry, coding)
+        # Each encoding is its own representation, so it gets its own strong ETag
+        etag = f'"{entry["etag"]}"' if coding == "identity" else f'"{entry["etag"]}-{coding}"'
+        if _etag_matches(req_headers.get("if-none-match"), etag):
+            return await self._send(send, 304, entry, etag, coding, b"", 0, key[1])
+        await self._send(send, entry["status"], entry, etag, coding, b"" if scope["method"] == "HEAD" else body, len(body), key[1])
+
+    async def _render(self, scope, receive, send, key):
+        # These pages take no parameters; dropping the query string keeps tracking
+        # params (?utm_source=...) out of the rendered canonical link.
+        # Accept-Encoding is stripped too: the cache stores identity bytes and compresses itself.
+        inner_scope = dict(scope, method="GET", query_string=b"",
+                           headers=[(k, v) for k, v in scope["headers"] if k != b"accept-encoding"])
+        started, chunks = {}, []
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                started.update(message)
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        await self.app(inner_scope, receive, capture)
+        raw_headers = started.get("headers", [])
+        body = b"".join(chunks)
+        status = started.get("status", 500)
+        entry = None
+        if status == 200 and not any(k.lower() == b"set-cookie" for k, _ in raw_headers):
+            if not key[2]:
+                body = inline_critical_css(key[1], body)
+            headers = [(k, v) for k, v in raw_headers if k.lower() not in (b"content-length", b"etag", b"cache-control")]
+            entry = self.cache.put(key, status, headers, body)
+        if entry is None:
+            # Not cacheable (error or cookie): pass the response through untouched
+            await send(started)
+            await send({"type": "http.response.body", "body": b"" if scope["method"] == "HEAD" else body})
+        return entry
+
+    async def _send(self, send, status, entry, etag, coding, body, content_length, path):
+        headers = [(k, v) for k, v in entry["headers"] if k.lower() != b"vary" and status != 304]
+        vary = next((v for k, v in entry["headers"] if k.lower() == b"vary"), b"")
+        if b"accept-encoding" not in vary.lower():
+            vary = vary + b", Accept-Encoding" if vary else b"Accept-Encoding"
+        headers += [
+            (b"vary", vary),
+            (b"etag", etag.encode()),
+            (b"cache-control", self.cache.cache_control.get(path, b"no-cache")),
+        ]
+        if entry["links"] and status != 304:
+            headers.append((b"link", ", ".join(entry["links"]).encode("latin-1")))
+        if status != 304:
+            if coding != "identity":
+                headers.append((b"content-encoding", coding.encode()))
+            headers.append((b"content-length", str(content_length).encode()))
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+app.add_middleware(PageCacheMiddleware, cache=page_cache)
+
+# --- Metrics ---
+# A small in-process registry rendered in the Prometheus text format on /metrics.
+# Recording is a dict lookup plus a bisect, so it is cheap enough for every request.
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(names, values, extra=""):
+    pairs = [f'{n}="{_escape_label(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name, self.help, self.labels = name, help_text, labels
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for label_values, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {value}")
+        return lines
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labels, self.buckets = name, help_text, labels, buckets
+        self.series = {} # label values -> [per-bucket counts..., +Inf count, sum]
+        self.lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(label_values)
+            if series is None:
+                series = self.series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, *label_values):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *label_values)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for label_values, series in sorted(self.series.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), series[:-1]):
+                cumulative += count
+                bucket_labels = _format_labels(self.labels, label_values, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            labels = _format_labels(self.labels, label_values)
+            lines.append(f"{self.name}_sum{labels} {series[-1]}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+http_requests = Counter("mfi_http_requests_total", "HTTP requests by route, method and status.", ("route", "method", "status"))
+http_latency = Histogram("mfi_http_request_duration_seconds", "Time to produce the full HTTP response.", ("route",))
+db_time = Histogram("mfi_db_operation_seconds", "Time spent in database session operations.", ("operation",))
+pool_wait = Histogram("mfi_db_pool_checkout_seconds", "Time spent waiting for a pooled database connection.")
+
+metric_collectors = [] # Callables returning extra exposition lines, evaluated at scrape time
+
+def render_metrics():
+    lines = []
+    for metric in (http_requests, http_latency, db_time, pool_wait):
+        lines += metric.render()
+    for collect in metric_collectors:
+        lines += collect()
+    return "\n".join(lines) + "\n"
+
+# Under launch.py each worker has its own registry and a scrape reaches whichever
+# worker accepts the connection. With MFI_METRICS_DIR set (launch.py sets it), every
+# process also writes its metrics to that directory, every MFI_METRICS_FLUSH_S and on
+# each scrape, and /metrics returns all of them with a worker="<pid>" label. Each
+# scrape then sees every worker's series, so totals are `sum without (worker) (...)`.
+METRICS_DIR = os.getenv("MFI_METRICS_DIR", "")
+METRICS_FLUSH_INTERVAL = float(os.getenv("MFI_METRICS_FLUSH_S", "5"))
+
+def write_metrics_snapshot():
+    path = os.path.join(METRICS_DIR, f"{os.getpid()}.prom")
+    with open(path + ".tmp", "w") as f:
+        f.write(render_metrics())
+    os.replace(path + ".tmp", path) # Readers never see a half-written file
+
+def _label_worker(sample, worker):
+    name, brace, rest = sample.partition("{")
+    if brace:
+        return f'{name}{{worker="{worker}",{rest}'
+    name, _, value = sample.partition(" ")
+    return f'{name}{{worker="{worker}"}} {value}'
+
+def merged_metrics():
+    """Every live process's metrics as one exposition, each sample labelled with its worker."""
+    write_metrics_snapshot()
+    families = {} # metric name -> (HELP/TYPE lines, samples from every worker)
+    stale_before = time.time() - 6 * METRICS_FLUSH_INTERVAL
+    for path in sorted(glob.glob(os.path.join(METRICS_DIR, "*.prom"))):
+        worker = os.path.basename(path)[:-len(".prom")]
+        try:
+            if os.path.getmtime(path) < stale_before: # Worker exited (or was replaced) without cleaning up
+                os.remove(path)
+                continue
+            with open(path) as f:
+                lines = f.read().splitlines()
+        except FileNotFoundError: # Removed by a concurrent scrape
+            continue
+        family = None
+        for line in lines:
+            if line.startswith(("# HELP ", "# TYPE ")):
+                family = line.split()[2]
+                headers = families.setdefault(family, ([], []))[0]
+                if line not in headers:
+                    headers.append(line)
+            elif line:
+                families.setdefault(family, ([], []))[1].append(_label_worker(line, worker))
+    return "\n".join(line for headers, samples in families.values() for line in headers + samples) + "\n"
+
+def _write_metrics_forever():
+    while True:
+        time.sleep(METRICS_FLUSH_INTERVAL)
+        try:
+            write_metrics_snapshot()
+        except OSError as e:
+            logging.warning(f"Could not write metrics snapshot: {e}")
+
+if METRICS_DIR:
+    threading.Thread(target=_write_metrics_forever, name="metrics-snapshot", daemon=True).start()
+
+class MetricsMiddleware:
+    """Records request count and latency per matched route template."""
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        start = time.perf_counter()
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = _route_label(scope)
+            elapsed = time.perf_counter() - start
+            http_latency.observe(elapsed, route)
+            http_requests.inc(route, scope["method"], status[0])
+            if "first_request" not in startup.phases: # Cold caches, lazy imports and the first pool connection
+                startup.phases["first_request"] = elapsed
+
+def _route_label(scope):
+    # Label by route template (not raw path) so label cardinality stays bounded
+    route = scope.get("route")
+    if route is not None:
+        return getattr(route, "path", "other")
+    if scope["path"] in page_cache.paths: # Served from the page cache, never reached the router
+        return scope["path"]
+    if scope["path"].startswith(ASSET_DIST_PREFIX): # Served by StaticAssetMiddleware
+        return ASSET_DIST_PREFIX + "*"
+    return "unmatched"
+
+
 # --- Database Model & Setup ---
 
 # Define the model for online participants
@@ -109,23 +768,235 @@ class OnlineParticipant(SQLModel, table=True):
     # Add __table_args__ if you need to support modifications on existing tables
     __table_args__ = ({'extend_existing': True},)
 
+# Admin search: keyset paging on (created_at, id) and case-insensitive prefix lookups.
+# text_pattern_ops lets Postgres use the lower() indexes for LIKE 'prefix%' under any collation.
+_participants = OnlineParticipant.__table__
+Index("ix_online_participants_created_at_id", _participants.c.created_at, _participants.c.id)
+Index("ix_online_participants_email_lower", func.lower(_participants.c.email).label("email_lower"),
+      postgresql_ops={"email_lower": "text_pattern_ops"})
+Index("ix_online_participants_name_lower", func.lower(_participants.c.name).label("name_lower"),
+      postgresql_ops={"name_lower": "text_pattern_ops"})
+
+# One row recording which version of the models the database was last created from
+class SchemaVersion(SQLModel, table=True):
+    __tablename__ = "schema_version"
+
+    id: int = Field(default=1, primary_key=True)
+    version: str
+    applied_at: datetime = Field(default_factory=datetime.now)
+
 
 # --- Database Setup Functions (provided by you) ---
+SCHEMA_LOCK_KEY = 0x6D6669 # Arbitrary, shared by every process that may run DDL
+
+def schema_fingerprint(metadata=SQLModel.metadata):
+    """Hash of every table, column, index and constraint the models declare."""
+    parts = []
+    for table in metadata.sorted_tables:
+        parts.append(f"table {table.name}")
+        for col in table.columns:
+            parts.append(f"  {col.name} {col.type} null={col.nullable} pk={col.primary_key} unique={col.unique}")
+        parts += sorted(f"  index {ix.name} {[c.name for c in ix.columns]} unique={ix.unique}" for ix in table.indexes)
+        parts += sorted(f"  constraint {type(c).__name__} {[col.name for col in getattr(c, 'columns', ())]}" for c in table.constraints)
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()[:16]
+
+def schema_is_current(engine, version):
+    # A single-row read instead of reflecting every table; a missing table just means "not current"
+    try:
+        with engine.connect() as conn:
+            stamp = conn.execute(select(SchemaVersion.version).where(SchemaVersion.id == 1)).first()
+    except DBAPIError:
+        return False
+    return stamp is not None and stamp[0] == version
+
 def init_db(engine): # Pass engine to init_db
-    SQLModel.metadata.create_all(engine, checkfirst=True)
+    """Creates missing tables when the models changed since the last stamp. Returns True if DDL ran."""
+    version = schema_fingerprint()
+    if schema_is_current(engine, version):
+        return False
+    with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            # Replicas booting together would otherwise race on CREATE TABLE
+            conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": SCHEMA_LOCK_KEY})
+        SQLModel.metadata.create_all(conn, checkfirst=True)
+        # create_all skips the indexes of tables that already exist, so add any new ones here
+        # (IF NOT EXISTS rather than checkfirst: SQLite can't reflect expression indexes)
+        for table in SQLModel.metadata.sorted_tables:
+            for index in table.indexes:
+                conn.execute(CreateIndex(index, if_not_exists=True))
+        # Columns changed on existing tables still need a migration
+        conn.execute(SchemaVersion.__table__.delete())
+        conn.execute(SchemaVersion.__table__.insert().values(id=1, version=version, applied_at=datetime.now()))
+    return True
+
+# Under launch.py the supervising process keeps one connection for its email dispatcher's
+# poller and one per MFI_EMAIL_WORKERS thread, and each worker process gets an equal
+# share of the rest of the budget. MFI_DB_POOL_SIZE / MFI_DB_MAX_OVERFLOW still override
+# the computed split.
+WORKER_COUNT = int(os.getenv("MFI_WORKERS", "1"))
+DB_MAX_CONNECTIONS = int(os.getenv("MFI_DB_MAX_CONNECTIONS", "15"))
+MIN_CONNECTIONS_PER_WORKER = 2 # launch.py caps WEB_CONCURRENCY to respect this
+LAUNCHER_PID = int(os.getenv("MFI_LAUNCHER_PID", "0")) # Set by launch.py, for itself and its workers
+_launcher_connections = 1 + int(os.getenv("MFI_EMAIL_WORKERS", "2")) if LAUNCHER_PID else 0
+_connections_per_worker = max(MIN_CONNECTIONS_PER_WORKER, (DB_MAX_CONNECTIONS - _launcher_connections) // WORKER_COUNT)
+if _connections_per_worker * WORKER_COUNT + _launcher_connections > DB_MAX_CONNECTIONS:
+    logging.warning(f"{WORKER_COUNT} workers x {_connections_per_worker} connections"
+                    + (f" + {_launcher_connections} for the launcher" if _launcher_connections else "")
+                    + f" exceeds MFI_DB_MAX_CONNECTIONS={DB_MAX_CONNECTIONS}; lower MFI_WORKERS/WEB_CONCURRENCY or raise the budget")
+if LAUNCHER_PID == os.getpid(): # The launcher itself; with a single worker uvicorn also serves from here
+    _connections_per_worker = _launcher_connections + (_connections_per_worker if WORKER_COUNT == 1 else 0)
+DB_POOL_SIZE = int(os.getenv("MFI_DB_POOL_SIZE", str(max(1, _connections_per_worker // 3))))
+DB_MAX_OVERFLOW = int(os.getenv("MFI_DB_MAX_OVERFLOW", str(_connections_per_worker - DB_POOL_SIZE)))
+# Seconds to wait for a free connection; registrations fall back to the spool after this
+DB_POOL_TIMEOUT = float(os.getenv("MFI_DB_POOL_TIMEOUT", "5"))
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waits for a connection."""
+    def _do_get(self):
+        with pool_wait.time():
+            return super()._do_get()
+
+class TimedAsyncQueuePool(AsyncAdaptedQueuePool):
+    def _do_get(self):
+        with pool_wait.time():
+            return super()._do_get()
+
+# --- SQLite Profile ---
+# Single-node events run on a local SQLite file. With the defaults every writer takes
+# the whole-database lock in rollback-journal mode and gives up at once when it is
+# busy. This profile switches to WAL (readers and the writer no longer block each
+# other), waits for locks instead of failing, and funnels registration inserts
+# through one writer thread (MFI_SQLITE_WRITER_BATCH inserts per commit at most),
+# unless MFI_ASYNC_DB or MFI_BATCH_WRITES selects another write path.
+# MFI_SQLITE_PROFILE=0 restores the old behaviour.
+
+USE_SQLITE_PROFILE = os.getenv("MFI_SQLITE_PROFILE", "1").lower() in ("1", "true", "yes")
+SQLITE_PRAGMAS = (
+    ("journal_mode", "WAL"),
+    # NORMAL only fsyncs at checkpoints in WAL mode; an OS crash can lose the last few commits, an app crash cannot
+    ("synchronous", os.getenv("MFI_SQLITE_SYNCHRONOUS", "NORMAL")),
+    ("busy_timeout", int(os.getenv("MFI_SQLITE_BUSY_TIMEOUT_MS", "5000"))),
+    ("cache_size", -64000), # KiB, i.e. a 64 MB page cache per connection
+    ("mmap_size", 256 * 1024 * 1024),
+    ("temp_store", "MEMORY"),
+)
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS:
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+def uses_sqlite_profile(database_url):
+    url = make_url(database_url)
+    return USE_SQLITE_PROFILE and url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:")
+
+class SQLiteWriter:
+    """One thread that performs every registration insert on a SQLite database.
+
+    SQLite allows a single writer at a time, so concurrent inserts only queue up on
+    its lock. Queueing them here instead lets each transaction commit everything
+    that arrived while the previous one ran (group commit), while reads keep using
+    the pooled connections concurrently.
+    """
+    def __init__(self, db_engine, max_batch=200):
+        self.db_engine, self.max_batch = db_engine, max_batch
+        self.jobs = queue.Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def submit(self, job):
+        """Queues `job(connection)`; returns a concurrent Future for its result."""
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive(): # Started lazily, and again after a fork
+                self.thread = threading.Thread(target=self._run, name="sqlite-writer", daemon=True)
+                self.thread.start()
+        future = concurrent.futures.Future()
+        self.jobs.put((job, future))
+        return future
+
+    async def run(self, job):
+        return await asyncio.wrap_future(self.submit(job))
+
+    def _run(self):
+        while True:
+            batch = [self.jobs.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self.jobs.get_nowait())
+                except queue.Empty:
+                    break
+            # Skip jobs whose caller has gone (asyncio.wrap_future passes cancellation on);
+            # the rest are marked running, so they can no longer be cancelled under us
+            batch = [(job, future) for job, future in batch if future.set_running_or_notify_cancel()]
+            try:
+                if batch:
+                    self._execute(batch)
+            except Exception as e: # Never let the writer thread die: later jobs would hang forever
+                logging.error(f"SQLite writer batch failed: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _execute(self, batch):
+        try:
+            with db_time.time("sqlite_group_commit"), self.db_engine.begin() as conn:
+                results = [job(conn) for job, _ in batch]
+        except Exception as e:
+            if len(batch) > 1: # Re-run one by one so only the failing job sees the error
+                for item in batch:
+                    self._execute([item])
+            else:
+                batch[0][1].set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
 
 def get_engine(database_url: str):
+    if uses_sqlite_profile(database_url):
+        db_engine = create_engine(
+            database_url,
+            echo=False,
+            pool_size=DB_POOL_SIZE, # Readers; writes to the file are serialised by SQLite (and SQLiteWriter)
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            poolclass=TimedQueuePool,
+            connect_args={"check_same_thread": False, "timeout": SQLITE_PRAGMAS[2][1] / 1000},
+        )
+        event.listen(db_engine, "connect", apply_sqlite_pragmas)
+        return db_engine
     # Production settings
     db_engine = create_engine(
         database_url,
         echo=False, # Set to True for debugging SQL queries
         pool_pre_ping=True,
-        pool_size=5,
-        max_overflow=10
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        poolclass=TimedQueuePool
     )
     logging.getLogger('sqlalchemy.engine').setLevel(logging.WARNING)
     return db_engine
 
+# Async drivers used when MFI_ASYNC_DB is enabled, picked from the URL's backend
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def get_async_engine(database_url: str):
+    """Async counterpart of get_engine: asyncpg for Postgres, aiosqlite for SQLite."""
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for database backend '{backend}'")
+    url = url.set(drivername=ASYNC_DRIVERS[backend])
+    pool_kwargs = dict(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT) if backend == "postgresql" else {}
+    db_engine = create_async_engine(url, echo=False, pool_pre_ping=True, poolclass=TimedAsyncQueuePool, **pool_kwargs)
+    if uses_sqlite_profile(database_url):
+        event.listen(db_engine.sync_engine, "connect", apply_sqlite_pragmas)
+    return db_engine
+
 # --- Database Initialization ---
 # Make sure this environment variable is set where you run the app
 DATABASE_URL = os.getenv("POSTGRES_MFI", "sqlite:///./default_mfi.db") # Provide a default SQLite DB for easy testing
@@ -135,14 +1006,380 @@ if not DATABASE_URL:
     # Optionally raise an error if PostgreSQL is strictly required:
     # raise ValueError("POSTGRES_SCAMP_URL environment variable is required")
 
+startup.lap("components")
 engine = get_engine(DATABASE_URL)
 
+# Opt-in: serve participant writes through an async engine so slow database
+# round trips don't tie up a worker thread per request
+USE_ASYNC_DB = os.getenv("MFI_ASYNC_DB", "").lower() in ("1", "true", "yes")
+async_engine = get_async_engine(DATABASE_URL) if USE_ASYNC_DB else None
+
+def _reset_pools_after_fork():
+    # A forked worker must never reuse the parent's sockets; give it fresh, empty pools
+    engine.dispose(close=False)
+    if async_engine is not None:
+        async_engine.sync_engine.dispose(close=False)
+
+os.register_at_fork(after_in_child=_reset_pools_after_fork)
+
+# Opt-in: batch registrations instead of one transaction per request (see ParticipantBatchWriter)
+USE_BATCH_WRITES = os.getenv("MFI_BATCH_WRITES", "").lower() in ("1", "true", "yes")
+# The SQLite profile's writer thread takes registration inserts unless a write path was
+# chosen explicitly: MFI_ASYNC_DB and MFI_BATCH_WRITES keep working as configured (the
+# pragmas still apply to the sync engine either way).
+USE_SQLITE_WRITER = uses_sqlite_profile(DATABASE_URL) and not (USE_ASYNC_DB or USE_BATCH_WRITES)
+sqlite_writer = SQLiteWriter(engine, max_batch=int(os.getenv("MFI_SQLITE_WRITER_BATCH", "200"))) if USE_SQLITE_WRITER else None
+startup.lap("engine")
+
 # --- End Database Model & Setup ---
 
+# --- Email Outbox ---
+# Registration writes an outbox row in the same transaction as the participant and
+# returns straight away. Background worker threads claim due rows in batches, send
+# them over long-lived SMTP connections under a shared rate limit, and retry
+# failures with exponential backoff. Point MFI_SMTP_HOST at a local stand-in such as
+# `python -m aiosmtpd -n -l localhost:1025` to try it out.
+
+class EmailOutbox(SQLModel, table=True):
+    __tablename__ = "email_outbox"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    participant_id: Optional[int] = Field(default=None, foreign_key="online_participants.id")
+    to_email: str
+    subject: str
+    body: str
+    status: str = Field(default="pending", index=True) # pending -> sending -> sent | failed
+    attempts: int = Field(default=0)
+    next_attempt_at: datetime = Field(default_factory=datetime.now, index=True)
+    claimed_at: Optional[datetime] = Field(default=None)
+    sent_at: Optional[datetime] = Field(default=None)
+    last_error: Optional[str] = Field(default=None)
+    created_at: datetime = Field(default_factory=datetime.now)
+    __table_args__ = ({'extend_existing': True},)
+
+EVENT_LINK = os.getenv("MFI_EVENT_LINK", "")
+
+def registration_email(participant_id, name, email):
+    """Returns the EmailOutbox fields for a participant's confirmation email."""
+    link_line = (f"Join the event here: {EVENT_LINK}" if EVENT_LINK
+                 else "We will send the meeting link closer to the event date.")
+    body = (f"Dear {name},\n\n"
+            "Thank you for registering for Meditate for India on 21st June 2025.\n"
+            f"{link_line}\n\n"
+            "With gratitude,\nThe Mindful Initiative")
+    return {"participant_id": participant_id, "to_email": email,
+            "subject": "You're registered for Meditate for India", "body": body,
+            "next_attempt_at": datetime.now(), "created_at": datetime.now()}
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, bursts of up to `capacity`."""
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self):
+        """Takes a token if one is available; otherwise returns the seconds until one will be."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+emails_total = Counter("mfi_emails_total", "Outbox emails by delivery result.", ("result",))
+metric_collectors.append(emails_total.render)
+
+class EmailDispatcher:
+    """Polls the outbox and feeds a pool of SMTP worker threads."""
+    def __init__(self, db_engine, host, port=587, username="", password="", starttls=True, sender="",
+                 workers=2, batch_size=50, rate=10.0, poll_interval=2.0, max_attempts=6, claim_timeout=600):
+        self.db_engine = db_engine
+        self.host, self.port, self.username, self.password, self.starttls = host, port, username, password, starttls
+        self.sender = sender or username
+        self.workers, self.batch_size, self.poll_interval = workers, batch_size, poll_interval
+        self.max_attempts, self.claim_timeout = max_attempts, claim_timeout
+        self.rate_limit = TokenBucket(rate)
+        self.queue = queue.Queue(maxsize=batch_size * workers * 2)
+        self.stopping = threading.Event()
+        self.threads = []
+
+    def start(self):
+        self.stopping.clear()
+        self.threads = [threading.Thread(target=self._poll, name="email-poller", daemon=True)]
+        self.threads += [threading.Thread(target=self._work, name=f"email-worker-{i}", daemon=True) for i in range(self.workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self, timeout=5):
+        self.stopping.set()
+        for thread in self.threads:
+            thread.join(timeout)
+
+    # --- Claiming ---
+
+    def claim_due(self):
+        """Marks up to batch_size due rows as 'sending' and returns them.
+
+        Rows left in 'sending' past claim_timeout (e.g. after a crash) are claimed again.
+        On Postgres, SKIP LOCKED lets several app processes share one outbox.
+        """
+        now = datetime.now()
+        due = or_(and_(EmailOutbox.status == "pending", EmailOutbox.next_attempt_at <= now),
+                  and_(EmailOutbox.status == "sending", EmailOutbox.claimed_at < now - timedelta(seconds=self.claim_timeout)))
+        query = select(EmailOutbox).where(due).order_by(EmailOutbox.id).limit(self.batch_size)
+        if self.db_engine.dialect.name == "postgresql":
+            query = query.with_for_update(skip_locked=True)
+        with Session(self.db_engine, expire_on_commit=False) as session:
+            rows = session.exec(query).all()
+            for row in rows:
+                row.status, row.claimed_at = "sending", now
+            session.commit()
+        return rows
+
+    def _poll(self):
+        while not self.stopping.is_set():
+            try:
+                rows = self.claim_due()
+            except Exception as e:
+                logging.error(f"Error claiming outbox emails: {e}")
+                rows = []
+            for row in rows:
+                self.queue.put(row)
+            if len(rows) < self.batch_size: # Caught up; otherwise keep draining
+                self.stopping.wait(self.poll_interval)
+
+    # --- Sending ---
+
+    def _connect(self):
+        smtp = smtplib.SMTP(self.host, self.port, timeout=30)
+        if self.starttls:
+            smtp.starttls()
+        if self.username:
+            smtp.login(self.username, self.password)
+        return smtp
+
+    def _next_batch(self):
+        try:
+            batch = [self.queue.get(timeout=1)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _work(self):
+        smtp = None
+        while not self.stopping.is_set():
+            batch = self._next_batch()
+            results = []
+            for row in batch:
+                while (wait := self.rate_limit.take()) > 0:
+                    time.sleep(wait)
+                try:
+                    smtp = smtp or self._connect() # One connection per worker, reused across batches
+                    smtp.send_message(self._message(row))
+                    results.append((row, None))
+                except Exception as e:
+                    results.append((row, str(e) or type(e).__name__))
+                    if isinstance(e, (smtplib.SMTPServerDisconnected, OSError)):
+                        smtp = self._close(smtp)
+            if results:
+                self._record(results)
+        self._close(smtp)
+
+    def _message(self, row):
+        msg = EmailMessage()
+        msg["From"], msg["To"], msg["Subject"] = self.sender, row.to_email, row.subject
+        msg.set_content(row.body)
+        return msg
+
+    def _close(self, smtp):
+        if smtp is not None:
+            try:
+                smtp.quit()
+            except Exception:
+                pass
+        return None
+
+    def _record(self, results):
+        """Stores a batch's outcomes: sent, rescheduled with backoff, or failed for good."""
+        now = datetime.now()
+        table = EmailOutbox.__table__
+        with self.db_engine.begin() as conn:
+            for row, error in results:
+                if error is None:
+                    values = {"status": "sent", "sent_at": now, "last_error": None}
+                    emails_total.inc("sent")
+                elif row.attempts + 1 >= self.max_attempts:
+                    values = {"status": "failed", "last_error": error}
+                    emails_total.inc("failed")
+                else:
+                    backoff = min(30 * 2 ** row.attempts, 3600) # 30s, 1m, 2m, ... capped at an hour
+                    values = {"status": "pending", "last_error": error, "next_attempt_at": now + timedelta(seconds=backoff)}
+                    emails_total.inc("retry")
+                if error is not None:
+                    values["attempts"] = row.attempts + 1
+                conn.execute(update(table).where(table.c.id == row.id).values(**values))
+
+SMTP_HOST = os.getenv("MFI_SMTP_HOST", "")
+email_dispatcher = EmailDispatcher(
+    engine,
+    host=SMTP_HOST,
+    port=int(os.getenv("MFI_SMTP_PORT", "587")),
+    username=os.getenv("MFI_SMTP_USER", ""),
+    password=os.getenv("MFI_SMTP_PASSWORD", ""),
+    starttls=os.getenv("MFI_SMTP_STARTTLS", "1").lower() in ("1", "true", "yes"),
+    sender=os.getenv("MFI_EMAIL_FROM", "info@themindfulinitiative.com"),
+    workers=int(os.getenv("MFI_EMAIL_WORKERS", "2")),
+    batch_size=int(os.getenv("MFI_EMAIL_BATCH", "50")),
+    rate=float(os.getenv("MFI_EMAIL_RATE", "10")), # Messages per second, across all workers
+) if SMTP_HOST else None # Without SMTP configured, emails wait in the outbox
+
 
 
 # --- Helper Functions & Components ---
 
+# --- Fragment Cache ---
+# Components that render the same markup for the same arguments are memoized as
+# serialized HTML, so pages splice in the stored string instead of rebuilding the tree.
+
+class CachedFragment:
+    """Pre-rendered HTML that FastHTML inserts into a page without escaping."""
+    def __init__(self, html):
+        self.html = html
+
+    def __ft__(self):
+        return Safe(self.html)
+
+fragment_caches = {} # Component name -> memoized wrapper, for stats and clearing
+
+def cached_fragment(maxsize=32):
+    """Decorator: caches a component's rendered HTML in an LRU keyed by its arguments."""
+    def decorator(func):
+        @functools.lru_cache(maxsize=maxsize)
+        def render(*args, **kwargs):
+            return CachedFragment(to_xml(func(*args, **kwargs)))
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return render(*args, **kwargs)
+
+        wrapper.cache_info = render.cache_info
+        wrapper.cache_clear = render.cache_clear
+        fragment_caches[func.__name__] = wrapper
+        return wrapper
+    return decorator
+
+def fragment_cache_stats():
+    """Returns hit/miss/size counters for every cached component."""
+    return {name: wrapper.cache_info()._asdict() for name, wrapper in fragment_caches.items()}
+
+def clear_fragment_caches():
+    for wrapper in fragment_caches.values():
+        wrapper.cache_clear()
+
+# --- Compiled Fragments ---
+# Per-request components whose only variable parts are a few strings are rendered
+# once with placeholder slots; each request then splices the escaped values into
+# the stored HTML instead of building and serializing a fresh FT tree.
+
+class CompiledFragment:
+    """A component compiled to static HTML pieces plus string slots for its arguments.
+
+    Slot values are escaped exactly as FT rendering would escape them. The rare
+    inputs that template splicing can't reproduce (a quote inside an attribute
+    value, non-string arguments) are rendered through the original component.
+    """
+    PROBE = "Zoë <b>&amp;</b> > <x@y.z?a=1&b=2>" # Checked at compile time against FT rendering
+
+    def __init__(self, func):
+        self.func = func
+        self.params = list(inspect.signature(func).parameters)
+        self.parts = None # Alternating static HTML and (arg index, in attribute) slots
+        self.compiled = None # None until first use; False if the component can't be templated
+
+    def compile(self):
+        markers = [f"slot{secrets.token_hex(8)}x{i}" for i in range(len(self.params))]
+        rendered = to_xml(self.func(*markers))
+        parts, pos = [], 0
+        for match in re.finditer("|".join(markers), rendered):
+            in_attribute = rendered.rfind("<", 0, match.start()) > rendered.rfind(">", 0, match.start())
+            parts += [rendered[pos:match.start()], (markers.index(match.group()), in_attribute)]
+            pos = match.end()
+        parts.append(rendered[pos:])
+        self.parts = parts
+        probe = [self.PROBE] * len(self.params)
+        self.compiled = self.splice(probe) == to_xml(self.func(*probe))
+        if not self.compiled:
+            logging.warning(f"{self.func.__name__} output depends on more than its slots; rendering it with FT")
+
+    def splice(self, values):
+        out = []
+        for part in self.parts:
+            if isinstance(part, str):
+                out.append(part)
+                continue
+            index, in_attribute = part
+            value = values[index]
+            if in_attribute and ('"' in value or "'" in value):
+                return None # FT would re-quote the whole attribute
+            out.append(html.escape(value, quote=False))
+        return "".join(out)
+
+    def render(self, *args, **kwargs):
+        """Returns the component's HTML for these arguments."""
+        if self.compiled is None:
+            self.compile()
+        values = inspect.signature(self.func).bind(*args, **kwargs).args if kwargs else args
+        if self.compiled and len(values) == len(self.params) and all(type(v) is str for v in values):
+            spliced = self.splice(values)
+            if spliced is not None:
+                return spliced
+        return to_xml(self.func(*args, **kwargs))
+
+# Templates are compiled at indentation level 0, which is where FastHTML serializes an
+# HTMX response. Full-page responses nest the component deeper, so they keep using FT.
+rendering_fragment = contextvars.ContextVar("rendering_fragment", default=False)
+
+class RenderModeMiddleware:
+    """Marks HTMX fragment requests so compiled fragments know they may be used."""
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        token = rendering_fragment.set(is_htmx_fragment(Headers(scope=scope)))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            rendering_fragment.reset(token)
+
+app.add_middleware(RenderModeMiddleware)
+
+def compiled_fragment(func):
+    """Decorator: renders a component through a CompiledFragment; `.ft` is the original."""
+    fragment = CompiledFragment(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not rendering_fragment.get():
+            return func(*args, **kwargs)
+        return CachedFragment(fragment.render(*args, **kwargs))
+
+    wrapper.ft = func
+    wrapper.fragment = fragment
+    return wrapper
+
+
 def primary_button(text, **kwargs):
     """Creates a button with the primary color #1DB0CD and hover state."""
     base_classes = "bg-[#1DB0CD] hover:bg-[#19a0bb] text-white font-semibold mb-4 p-2 rounded-md transition duration-300"
@@ -150,12 +1387,13 @@ def primary_button(text, **kwargs):
     all_classes = f"{base_classes} {kwargs.pop('cls', '')}"
     return Button(text, cls=all_classes.strip(), **kwargs)
 
+@cached_fragment()
 def join_online_modal():
     """Creates the modal popup using DaisyUI classes like the Attendance Form."""
     modal_container = Div(
         # Backdrop (Standard Tailwind)
         Div(cls="fixed inset-0 backdrop-blur-sm bg-white/30 z-[90]",
-            hx_get="/close-modal", hx_target="#join-modal-container", hx_swap="delete"),
+            onclick="closeJoinModal()"),
         # Centering wrapper (Standard Tailwind)
         Div(cls="fixed inset-0 z-[100] flex items-center justify-center p-4")(
             # Modal Box (Using DaisyUI Card Style)
@@ -163,7 +1401,7 @@ def join_online_modal():
                 # Close button (Standard Tailwind, positioned relative to card)
                 Button("×",
                        cls="absolute top-2 right-3 text-[#1DB0CD] hover:text-[#19a0bb] opacity-70 hover:opacity-100 text-2xl font-bold", # Use base-content for text
-                       hx_get="/close-modal", hx_target="#join-modal-container", hx_swap="delete"),
+                       onclick="closeJoinModal()"),
                 # Modal Content Area / Card Body
                 Div(id="modal-content", cls="card-body")( # Added card-body class
                      # --- Registration Form (Using DaisyUI Form Control/Input/Button Styles) ---
@@ -206,6 +1444,8 @@ def join_online_modal():
                                    # Use btn and btn-primary from DaisyUI, make it full width
                                    cls="w-full")
                         ),
+                        # Lets the server recognise resubmits of this form; filled in per opened modal below
+                        Input(type="hidden", name="idempotency_key"),
                         # HTMX attributes
                         hx_post="/participants/online",
                         hx_target="#modal-content",
@@ -215,10 +1455,21 @@ def join_online_modal():
                 ) # End #modal-content / card-body
             ) # End Modal Box / card
         ), # End Centering wrapper
+        # The fragment itself is cached, so the key is generated in the browser each time it is swapped in
+        Script("""
+        (() => {
+            const field = document.querySelector('#join-modal-container input[name="idempotency_key"]');
+            if (field && !field.value) {
+                field.value = window.crypto && crypto.randomUUID ? crypto.randomUUID()
+                    : Date.now().toString(36) + Math.random().toString(36).slice(2);
+            }
+        })();
+        """),
         id="join-modal-container"
     )
     return modal_container
 
+@compiled_fragment
 def registration_success_message(name, email):
     """Generates the final success message Div styled like the screenshot."""
     # Main container for the success message content
@@ -243,6 +1494,7 @@ def registration_success_message(name, email):
     )
 
 
+@compiled_fragment
 def registration_error_message(message_text):
     """Generates an error message Div."""
     return Div(id="modal-content", cls="text-center p-4 text-red-600")( # Target the same ID
@@ -250,12 +1502,32 @@ def registration_error_message(message_text):
         P(message_text, cls="font-rest mb-6"),
         Button("Close",
                 cls="bg-gray-300 hover:bg-gray-400 text-gray-800 font-medium py-2 px-4 rounded-md transition duration-300",
-                hx_get="/close-modal",
-                hx_target="#join-modal-container",
-                hx_swap="delete")
+                onclick="closeJoinModal()") # Closed client-side, no request
     )
 
 
+@compiled_fragment
+def confirmation_step(name, email):
+    """The confirm/cancel step shown in the modal after a successful submit."""
+    return Div(id="modal-content", cls="flex flex-col justify-center content-center text-center gap-y-4")( # Target same ID
+        H3("Confirm", cls="font-heading text-2xl text-[#004552] mb-4"),
+        P("You will be receiving a meeting link on the email id that you provided.",
+          cls="font-rest text-gray-700 mb-6"),
+        primary_button( # Use the helper for styling
+            "Confirm",
+            hx_get=f"/registration-confirmed?name={name}&email={email}", # Pass name for final message
+            hx_target="#modal-content",  # Target same content area
+            hx_swap="innerHTML"         # Replace confirmation with success message
+        ),
+        Button(  # Use standard secondary/gray button style
+            "Cancel",
+            cls="bg-gray-200 hover:bg-gray-300 text-gray-700 font-medium p-2 rounded-md transition duration-300",
+            onclick="closeJoinModal()"  # Close modal directly, no request
+        )
+    )
+
+
+@cached_fragment()
 def meditation_button(additional_classes=""):
     """Helper function to avoid button style duplication"""
     base_classes = "bg-[#1DB0CD] hover:bg-[#19a0bb] text-white font-medium py-3 px-3 rounded-md transition duration-300 h-12 w-44 text-sm"
@@ -265,18 +1537,42 @@ def meditation_button(additional_classes=""):
                   hx_swap = "beforeend"  # Add it at the end
                   )("Join Meditate for India")
 
+def registration_count():
+    """Live "N people have joined" line, filled in from /events/registrations.
+
+    Rendered without a number so the cached homepage never shows a stale count;
+    it stays hidden until the first event arrives.
+    """
+    return Div(
+        P(id="registration-count", cls="hidden text-teal-800 font-bold mt-2 md:text-[20px]")(
+            Span(id="registration-count-value"), " people have joined"),
+        Script("""
+        (() => {
+            if (!window.EventSource) return;
+            const line = document.getElementById('registration-count');
+            const source = new EventSource('/events/registrations');
+            source.addEventListener('count', (evt) => {
+                document.getElementById('registration-count-value').textContent = Number(evt.data).toLocaleString('en-IN');
+                line.classList.remove('hidden');
+            });
+        })();
+        """)
+    )
+
 # --- Responsive Navbar Components ---
 
+@cached_fragment()
 def hamburger_button():
     """Creates the hamburger button visible only on mobile."""
     # SVG for hamburger icon
-    hamburger_icon = Img(src="/static/img/hamburger.svg", alt="Menu", cls="w-6 h-6")
+    hamburger_icon = Img(src=asset_url("/static/img/hamburger.svg"), alt="Menu", cls="w-6 h-6")
     # Button shown only below md breakpoint, triggers JS toggle function
     return Button(hamburger_icon,
                   id="hamburger-btn",
                   cls="md:hidden ml-auto p-2 text-gray-800 hover:bg-gray-100 rounded focus:outline-none focus:ring-2 focus:ring-inset focus:ring-blue-500", # Added focus styles
                   onclick="toggleMenu()") # Simple JS toggle
 
+@cached_fragment()
 def footer():
     return Div(cls="mt-16 hidden md:block w-full bg-[#F4F8F9] py-10 relative")(
                         # Shadow element positioned at the top of the footer
@@ -351,6 +1647,7 @@ def faq_accordion_item(question: str, answer: Any, faq_id: str):
         )
     )
 
+@cached_fragment()
 def faq_content():
     """Generates the main content for the FAQ page."""
     faqs = [
@@ -374,6 +1671,7 @@ def faq_content():
 
 
 
+@cached_fragment()
 def mobile_menu():
     """Creates the mobile navigation menu, hidden by default."""
     # Define links for the mobile menu
@@ -398,6 +1696,7 @@ def mobile_menu():
                # Initially hidden, shown only below md when toggled
                cls="hidden md:hidden fixed top-16 left-0 right-0 bg-[#F4F8F9] shadow-md flex-col p-4 space-y-1 z-50") # Adjusted top, space-y
 
+@cached_fragment()
 def desktop_navbar():
     """The original navbar, now specifically for desktop (md and up)."""
     return Nav(cls="hidden md:flex space-x-8")( # Renamed variable, adjusted spacing
@@ -428,7 +1727,7 @@ header_container = Div(cls="bg-[#F4F8F9] shadow-sm")(
         Div(cls="flex items-center gap-x-8")( # Group logo and nav, add gap
             # Logo Link
             A(href="/")(
-                Img(src="/static/img/TMIlogo.png",
+                Img(src=asset_url("/static/img/TMIlogo.png"),
                     alt="The Mindful Initiative Logo",
                     cls="h-8 w-auto")
             ),
@@ -470,9 +1769,8 @@ def get_homepage():
                 Div(cls="w-full flex flex-col items-center justify-center mt-16")(
 
                     Div(cls="relative w-full flex flex-col items-center justify-center")(
-                        Img(cls="md:w-auto md:h-auto hidden md:block", src='static/img/meditation-desktop.png',
-                            alt="mfi-desktop"),
-                        Img(cls="w-98 md:hidden", src='static/img/meditation-desktop.png', alt="mfi-mobile"),
+                        responsive_img('static/img/meditation-desktop.png', cls="w-98 md:w-auto md:h-auto",
+                                       sizes=f"{MD_MEDIA} 1028px, 392px", alt="mfi", fetchpriority="high"),
                         H1(cls="absolute text-[#004552] text-center text-4xl -top-5 ml-3.5 md:text-[64px] md:top-4 md:mt-18 md:-mr-12 font-heading")(
                             "Meditate for India"),
                         Div(cls="absolute flex flex-col text-sm items-center justify-center mt-[9rem] md:mt-80 md:text-xl text-center")(
@@ -484,13 +1782,15 @@ def get_homepage():
                                 Span(cls="block font-bold pt-1 md:text-[24px] md:pt-4")("21st June 2025 From: time")
                             ),
 
+                            registration_count(),
                             meditation_button("hidden md:block mt-4 md:text-[14px] md:w-52")
                         ),
                         meditation_button("block md:hidden mt-4"),
                     ),
                     Div(cls="mt-16 w-full flex items-center justify-center gap-12 lg:gap-50")(
                         Div(cls="flex flex-col items-center justify-center")(
-                            Img(cls="md:w-25 md:h-25 w-12 h-12", src='static/img/imagine-desktop.png', alt="imagine")(),
+                            responsive_img('static/img/imagine-mobile.png', desktop_src='static/img/imagine-desktop.png',
+                                           cls="md:w-25 md:h-25 w-12 h-12", alt="imagine"),
                             P(cls="text-xs md:text-xl text-center text-[#004552]")(
                                 Span(cls="block")("Reimagining a"),
                                 Span(cls="block")("Mindful India")
@@ -501,7 +1801,7 @@ def get_homepage():
                             )
                         ),
                         Div(cls="flex flex-col items-center justify-center")(
-                            Img(cls="md:w-25 md:h-25 w-12 h-12", src='static/img/celebrate.svg', alt="celebrate")(),
+                            Img(cls="md:w-25 md:h-25 w-12 h-12", src=asset_url('static/img/celebrate.svg'), alt="celebrate")(),
                             P(cls="text-xs md:text-xl text-center text-[#004552]")(
                                 Span(cls="block")("Celebrating"),
                                 Span(cls="block")("Our Heritage")
@@ -512,8 +1812,8 @@ def get_homepage():
                             )
                         ),
                         Div(cls="flex flex-col items-center justify-center")(
-                            Img(cls="md:w-25 md:h-25 w-12 h-12", src='static/img/cultivate-desktop.png',
-                                alt="cultivate")(),
+                            responsive_img('static/img/cultivate-mobile.png', desktop_src='static/img/cultivate-desktop.png',
+                                           cls="md:w-25 md:h-25 w-12 h-12", alt="cultivate"),
                             P(cls=" text-xs md:text-xl text-center text-[#004552]")(
                                 Span(cls="block")("Cultivating"),
                                 Span(cls="block")("Inner Wisdom")
@@ -525,9 +1825,8 @@ def get_homepage():
                         ),
                     ),
                     Div(cls="mt-16 w-[370px] md:w-[1088px] flex flex-col items-center justify-center gap-10 content-center")(
-                        Img(cls="md:w-auto md:h-auto hidden md:block", src='static/img/meditate-desktop.svg',
-                            alt="meditate2.0-desktop"),
-                        Img(cls="md:hidden w-60", src='static/img/meditate.svg', alt="meditate2.0-mobile"),
+                        responsive_img('static/img/meditate.svg', desktop_src='static/img/meditate-desktop.svg',
+                                       cls="w-60 md:w-auto md:h-auto", alt="meditate2.0"),
                         Div(cls="w-[370px] md:w-[1034px] flex flex-col items-center justify-center gap-10 content-center")(
                             H1(cls="font-heading font-[400px] text-[24px] md:text-[32px] text-center text-[#004552]")(
                                 "A Movement Rooted in Tradition"),
@@ -556,15 +1855,12 @@ def get_homepage():
                         ),
                     ),
                     Div(cls="mt-16 w-[404px] md:w-[1920px] flex flex-col items-center justify-center gap-10")(
-                        Img(
-                            src="static/img/reason-mobile.svg",
+                        responsive_img(
+                            "static/img/reason-mobile.svg",
+                            desktop_src="static/img/reasons.svg",
                             alt="Meditate for India Infographic",
-                            cls="w-full block md:hidden"
-                        ),
-                        Img(
-                            src="static/img/reasons.svg",
-                            alt="Meditate for India Infographic",
-                            cls="w-full hidden md:block"
+                            cls="w-full",
+                            loading="lazy"
                         ),
 
                     ),
@@ -584,7 +1880,7 @@ def get_homepage():
                             Div(cls="grid grid-cols-4 gap-8 mb-8")(
                                 *[Div(cls="flex flex-col items-center")(
                                     Div(cls="w-44 h-44 rounded-full overflow-hidden mb-4")(
-                                        Img(src="static/img/speaker.png", cls="w-full h-full object-cover")
+                                        responsive_img("static/img/speaker.png", cls="w-full h-full object-cover", sizes="176px", loading="lazy")
                                     ),
                                     P(cls="text-center font-[500px] text-[24px] text-[#006478] mb-1")("Sri Kunal Kendurkar"),
                                     P(cls="text-center text-[24px] text-[#006478]")("Yoga Coach")
@@ -595,7 +1891,7 @@ def get_homepage():
                             Div(cls="grid grid-cols-3 gap-8 mx-auto w-3/4")(
                                 *[Div(cls="flex flex-col items-center")(
                                     Div(cls="w-44 h-44 rounded-full overflow-hidden mb-4")(
-                                        Img(src="static/img/speaker.png", cls="w-full h-full object-cover")
+                                        responsive_img("static/img/speaker.png", cls="w-full h-full object-cover", sizes="176px", loading="lazy")
                                     ),
                                     P(cls="text-center font-[500px] text-[24px] text-[#006478] mb-1")("Sri Kunal Kendurkar"),
                                     P(cls="text-center text-[24px] text-[#006478]")("Yoga Coach")
@@ -609,7 +1905,7 @@ def get_homepage():
                             Div(cls="flex justify-center gap-2 mb-4")(
                                 *[Div(cls="flex flex-col items-center")(
                                     Div(cls="w-24 h-24 rounded-full overflow-hidden mb-2")(
-                                        Img(src="static/img/speaker.png", cls="w-full h-full object-cover")
+                                        responsive_img("static/img/speaker.png", cls="w-full h-full object-cover", sizes="96px", loading="lazy")
                                     ),
                                     P(cls="text-center font-[500px] text-[12px] text-[#006478] mb-0.5")(
                                         "Sri Kunal Kendurkar"),
@@ -621,7 +1917,7 @@ def get_homepage():
                             Div(cls="flex justify-center gap-2")(
                                 *[Div(cls="flex flex-col items-center")(
                                     Div(cls="w-24 h-24 rounded-full overflow-hidden mb-2")(
-                                        Img(src="static/img/speaker.png", cls="w-full h-full object-cover")
+                                        responsive_img("static/img/speaker.png", cls="w-full h-full object-cover", sizes="96px", loading="lazy")
                                     ),
                                     P(cls="text-center font-[500px] text-[12px] text-[#006478] mb-0.5")(
                                         "Sri Kunal Kendurkar"),
@@ -632,8 +1928,9 @@ def get_homepage():
                     ),
 
                     Div(cls="mt-16 w-full hidden md:flex flex-col items-center justify-center gap-10 relative")(
-                        Img(cls="md:w-auto md:h-auto hidden md:block", src='static/img/join-us-desktop.png',
-                            alt="mfi-desktop"),
+                        # Lazy, so mobile (where this section is display:none) never fetches it
+                        responsive_img('static/img/join-us-desktop.png', cls="md:w-auto md:h-auto hidden md:block",
+                                       sizes="1088px", alt="mfi-desktop", loading="lazy"),
                         H1(cls="absolute text-center text-[64px] font-heading mt-60 text-[#006478]")("“Join Us”"),
                         P(cls="absolute text-center font-rest leading-relaxed text-2xl text-[#006478] font-extralight mt-100")(
                             B("Online:"),
@@ -658,7 +1955,7 @@ def about():
     # Define the main content for the About Us page
     # REMOVED min-h-full as flex-grow will handle expansion
     about_content = Div(cls="min-w-full max-w-2xl mx-auto px-4 py-8 md:py-16 flex flex-col justify-center items-center text-center mb-16 flex-grow")( # ADDED flex-grow
-        Img(cls="mb-10", src='static/img/TMIlogo.png'),
+        Img(cls="mb-10", src=asset_url('static/img/TMIlogo.png'), fetchpriority="high"),
         # H1(cls="font-heading font-light text-[32px]  text-[#004552] mb-6")("The Mindful Initiative"),
         P(cls="font-rest text-[24px] font-light text-[#006478] leading-relaxed mb-4")(
             Span(cls="block")("Meditate for India is organized by The Mindful Initiative, an organization"),
@@ -693,7 +1990,7 @@ def join():
     join_content = Div(
         cls="min-w-full max-w-2xl mx-auto px-4 py-8 md:py-16 flex flex-col items-center text-center justify-center mb-16 flex-grow")(
         # ADDED flex-grow
-        Img(cls="mb-10", src='static/img/together.png'),
+        Img(cls="mb-10", src=asset_url('static/img/together.png'), fetchpriority="high"),
         H1(cls="font-heading text-[32px] text-[#006478] mb-6 font-light")("Let’s Meditate for India."),
         H1(cls="font-heading text-[32px] font-light text-[#006478] mb-6")("Let’s Meditate for Ourselves."),
         P(cls="font-rest font-light text-[24px] text-lg md:text-[24px] text-[#006478] leading-relaxed mb-4")(
@@ -735,43 +2032,545 @@ def get_join_modal():
     """Route to serve the join online modal HTML."""
     return join_online_modal()
 
-@rt("/participants/online")
-def add_online_participant(participant: OnlineParticipant):
-    """Handles submission, saves data, and returns the confirmation step."""
-    try:
-        with Session(engine) as session:
-            session.add(participant)
+def _save_participant_sync(participant):
+    with Session(engine) as session:
+        session.add(participant)
+        session.flush() # Assigns participant.id for the outbox row
+        session.add(EmailOutbox(**registration_email(participant.id, participant.name, participant.email)))
+        with db_time.time("commit"):
             session.commit()
+        with db_time.time("refresh"):
             session.refresh(participant)
+    return participant
+
+class DuplicateEmailError(Exception):
+    """Raised when a registration's email is already taken."""
+
+def is_duplicate_email(error):
+    """True if an IntegrityError came from the email unique index (not, say, a NOT NULL column)."""
+    orig = getattr(error, "orig", None)
+    constraint = getattr(getattr(orig, "diag", None), "constraint_name", None) # psycopg2
+    if constraint:
+        return "email" in constraint
+    # SQLite: "UNIQUE constraint failed: online_participants.email"; asyncpg:
+    # 'duplicate key value violates unique constraint "ix_online_participants_email"'
+    message = str(orig or error).lower()
+    return "unique" in message and "email" in message
+
+def participant_insert_statements(dialect_name, values):
+    """INSERT ... ON CONFLICT (email) DO NOTHING RETURNING (id, email) for `values`, plus a
+    builder for the outbox rows of whichever participants actually went in."""
+    insert = pg_insert if dialect_name == "postgresql" else sqlite_insert
+    table = OnlineParticipant.__table__
+    stmt = (insert(table).values(values)
+            .on_conflict_do_nothing(index_elements=[table.c.email])
+            .returning(table.c.id, table.c.email))
+    names = {v["email"]: v["name"] for v in values}
+
+    def outbox_stmt(rows): # Confirmation emails for the rows that went in, same transaction
+        return insert(EmailOutbox.__table__).values([registration_email(row_id, names[email], email) for row_id, email in rows])
+    return stmt, outbox_stmt
+
+class ParticipantBatchWriter:
+    """Write-behind queue that groups concurrent registrations into one multi-row INSERT.
+
+    Rows are collected for up to `max_wait` seconds or `max_batch` rows, then written with
+    INSERT ... ON CONFLICT (email) DO NOTHING RETURNING, so each caller still learns
+    whether its own row went in or hit an existing email.
+    """
+    def __init__(self, max_batch=100, max_wait=0.005):
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.loop = None
+        self.queue = None
+        self.task = None
+
+    async def submit(self, participant):
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop: # (Re)start the flusher on the loop that is serving requests
+            self.loop, self.queue = loop, asyncio.Queue()
+            self.task = loop.create_task(self._run())
+        future = loop.create_future()
+        await self.queue.put((participant, future))
+        return await future
+
+    async def _run(self):
+        while True:
+            batch = [await self.queue.get()]
+            try:
+                deadline = self.loop.time() + self.max_wait
+                while len(batch) < self.max_batch:
+                    timeout = deadline - self.loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                await self._flush(batch)
+            except Exception as e: # One bad batch must not stop the flusher; its callers get the error
+                logging.error(f"Error flushing participant batch: {e}")
+                for _, future in batch:
+                    self._resolve(future, error=e)
+
+    @staticmethod
+    def _resolve(future, result=None, error=None):
+        if future.done(): # The caller was cancelled (e.g. client disconnected); nobody is waiting
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    async def _flush(self, batch):
+        # The first submission of an email in a batch wins; later ones are duplicates
+        pending = {}
+        for participant, future in batch:
+            if participant.email in pending:
+                self._resolve(future, error=DuplicateEmailError(participant.email))
+            else:
+                pending[participant.email] = (participant, future)
+
+        try:
+            rows = await self._insert([p.model_dump(exclude={"id"}) for p, _ in pending.values()])
+        except Exception as e:
+            for _, future in pending.values():
+                self._resolve(future, error=e)
+            return
+
+        inserted = {email: row_id for row_id, email in rows}
+        for email, (participant, future) in pending.items():
+            if email in inserted:
+                participant.id = inserted[email]
+                self._resolve(future, participant)
+            else:
+                self._resolve(future, error=DuplicateEmailError(email))
+
+    async def _insert(self, values):
+        stmt, outbox_stmt = participant_insert_statements((async_engine or engine).dialect.name, values)
+        if async_engine is not None:
+            with db_time.time("batch_insert"):
+                async with async_engine.begin() as conn:
+                    rows = (await conn.execute(stmt)).all()
+                    if rows:
+                        await conn.execute(outbox_stmt(rows))
+                    return rows
+
+        def execute():
+            with db_time.time("batch_insert"), engine.begin() as conn:
+                rows = conn.execute(stmt).all()
+                if rows:
+                    conn.execute(outbox_stmt(rows))
+                return rows
+        return await run_in_threadpool(execute)
+
+class RegisteredEmails:
+    """In-memory set of registered emails so repeat submissions skip the database.
+
+    Only ever holds emails known to be in `online_participants`; anything it misses
+    (e.g. rows written by another worker) is still caught by the unique index.
+    """
+    def __init__(self):
+        self.emails = set()
+
+    def load(self, db_engine):
+        with Session(db_engine) as session:
+            self.emails = set(session.exec(select(OnlineParticipant.email)))
+
+    def add(self, email):
+        self.emails.add(email)
+
+    def __contains__(self, email):
+        return email in self.emails
+
+registered_emails = RegisteredEmails()
+
+class RegistrationSpool:
+    """Append-only local file that takes registrations while the database is unreachable.
+
+    Each registration is one fsynced NDJSON line, so an acknowledged signup survives
+    a crash. A replayer thread periodically claims the file (by renaming it), inserts
+    its rows in batches with ON CONFLICT (email) DO NOTHING, and deletes it once every
+    batch has committed. Replaying a file twice is harmless, so a failed replay just
+    leaves the file for the next attempt. flock() keeps several worker processes on
+    one host from interleaving appends with a claim.
+    """
+    def __init__(self, path, batch_size=500, interval=5.0):
+        self.path, self.batch_size, self.interval = path, batch_size, interval
+        self.spooled = set() # Emails accepted into the spool by this process and not yet replayed
+        self.stopping = threading.Event()
+        self.thread = None
+
+    def append(self, participant):
+        if participant.email in self.spooled:
+            return # Already acknowledged; the resubmit needs no second line
+        record = participant.model_dump(exclude={"id"}, mode="json")
+        line = (json.dumps(record) + "\n").encode()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        while True:
+            fd = os.open(self.path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                try:
+                    if os.stat(self.path).st_ino != os.fstat(fd).st_ino:
+                        continue # Claimed by the replayer while we waited for the lock; reopen
+                except FileNotFoundError:
+                    continue
+                size = os.fstat(fd).st_size
+                if size and os.pread(fd, 1, size - 1) != b"\n": # Don't glue onto a line torn by a crash
+                    line = b"\n" + line
+                os.write(fd, line)
+                os.fsync(fd)
+                break
+            finally:
+                os.close(fd) # Also releases the lock
+        self.spooled.add(participant.email)
+        spooled_total.inc("spooled")
+
+    def pending(self):
+        """(files, bytes) waiting to be replayed: the live spool plus any claimed by a replay."""
+        files = total = 0
+        for path in glob.glob(glob.escape(self.path) + "*"):
+            try:
+                total += os.path.getsize(path)
+                files += 1
+            except FileNotFoundError: # Replayed and deleted while we looked
+                pass
+        return files, total
+
+    def metrics(self):
+        files, total = self.pending()
+        return ["# HELP mfi_spool_pending_files Spool files waiting to be replayed into the database.",
+                "# TYPE mfi_spool_pending_files gauge",
+                f"mfi_spool_pending_files {files}",
+                "# HELP mfi_spool_pending_bytes Size of the spool files waiting to be replayed.",
+                "# TYPE mfi_spool_pending_bytes gauge",
+                f"mfi_spool_pending_bytes {total}"]
+
+    # --- Replay ---
+
+    def start(self):
+        self.stopping.clear()
+        self.thread = threading.Thread(target=self._run, name="spool-replayer", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=5):
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def _run(self):
+        while not self.stopping.wait(self.interval):
+            try:
+                self.replay()
+            except Exception as e: # Database still down, most likely; try again next round
+                logging.warning(f"Spool replay failed, will retry: {e}")
+
+    def claim(self):
+        """Renames the live spool file to a unique .replaying name so new appends start a fresh file."""
+        if not os.path.exists(self.path):
+            return
+        fd = os.open(self.path, os.O_RDONLY)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            if os.path.exists(self.path) and os.stat(self.path).st_ino == os.fstat(fd).st_ino:
+                os.rename(self.path, f"{self.path}.{os.getpid()}.{time.time_ns()}.replaying")
+        finally:
+            os.close(fd)
+
+    def replay(self):
+        """Drains every claimed spool file into online_participants; returns rows inserted."""
+        self.claim()
+        inserted = 0
+        for claimed in sorted(glob.glob(glob.escape(self.path) + ".*.replaying")):
+            try:
+                fd = os.open(claimed, os.O_RDONLY)
+            except FileNotFoundError: # Another worker finished it first
+                continue
+            try:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError: # Another worker is replaying it right now
+                    continue
+                if os.fstat(fd).st_nlink == 0:
+                    continue
+                with os.fdopen(os.dup(fd), "rb") as f:
+                    records = self._read(f)
+                for start in range(0, len(records), self.batch_size):
+                    inserted += self._insert(records[start:start + self.batch_size])
+                os.unlink(claimed)
+            finally:
+                os.close(fd)
+        return inserted
+
+    def _read(self, f):
+        records = {} # First line for an email wins, like a first submit does
+        for number, raw in enumerate(f, 1):
+            if not raw.strip():
+                continue
+            try:
+                record = json.loads(raw)
+            except ValueError: # e.g. a line cut short by a crash mid-write
+                logging.error(f"Skipping unreadable spool line {number}: {raw[:200]!r}")
+                continue
+            record["created_at"] = datetime.fromisoformat(record["created_at"])
+            records.setdefault(record["email"], record)
+        return list(records.values())
+
+    def _insert(self, records):
+        stmt, outbox_stmt = participant_insert_statements(engine.dialect.name, records)
+        with db_time.time("spool_replay"), engine.begin() as conn:
+            rows = conn.execute(stmt).all()
+            if rows:
+                conn.execute(outbox_stmt(rows))
+        for record in records:
+            registered_emails.add(record["email"])
+            self.spooled.discard(record["email"])
+        spooled_total.inc("replayed", amount=len(rows))
+        spooled_total.inc("duplicate", amount=len(records) - len(rows))
+        registration_counter.increment(len(rows))
+        return len(rows)
+
+# Errors that mean "the database can't take this write right now", as opposed to a bad row
+DB_UNAVAILABLE_ERRORS = (OperationalError, InterfaceError, PoolTimeoutError, ConnectionError, OSError)
+
+spooled_total = Counter("mfi_spooled_registrations_total", "Registrations through the outage spool by outcome.", ("result",))
+metric_collectors.append(spooled_total.render)
+
+SPOOL_PATH = os.getenv("MFI_SPOOL_PATH", os.path.join("spool", "registrations.ndjson")) # Empty disables spooling
+registration_spool = RegistrationSpool(
+    SPOOL_PATH,
+    batch_size=int(os.getenv("MFI_SPOOL_BATCH_SIZE", "500")),
+    interval=float(os.getenv("MFI_SPOOL_REPLAY_S", "5")),
+) if SPOOL_PATH else None
+if registration_spool is not None:
+    metric_collectors.append(registration_spool.metrics)
+
+class RegistrationCounter:
+    """Participant count held in memory and pushed to open pages through one SSE hub.
+
+    Seeded with a single COUNT(*) per process and bumped on every successful
+    registration, so visitors never touch the table. A single publisher task fans
+    the value out to subscriber queues at most once per `min_interval`; each queue
+    holds only the latest count, so slow clients never build a backlog.
+    """
+    def __init__(self, min_interval=0.25, resync_interval=60, max_subscribers=10000):
+        self.count = 0
+        self.min_interval = min_interval
+        self.resync_interval = resync_interval # Picks up rows written by other workers or bulk imports
+        self.max_subscribers = max_subscribers
+        self.subscribers = set()
+        self.loop = self.changed = self.task = None
+
+    def load(self, db_engine):
+        with Session(db_engine) as session:
+            self.count = session.exec(select(func.count()).select_from(OnlineParticipant)).one()
+
+    def increment(self, amount=1):
+        self.count += amount
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.changed.set)
+
+    def subscribe(self):
+        """Returns a queue that receives the current count and then each change, or None when full."""
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop: # (Re)start the publisher on the loop that is serving requests
+            self.loop, self.changed = loop, asyncio.Event()
+            self.task = loop.create_task(self._run(self.count)) # The value new subscribers are about to get
+        if len(self.subscribers) >= self.max_subscribers:
+            return None
+        subscriber = asyncio.Queue(maxsize=1)
+        subscriber.put_nowait(self.count)
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        self.subscribers.discard(subscriber)
+
+    async def _run(self, published):
+        last_resync = self.loop.time()
+        while True:
+            timeout = max(0, last_resync + self.resync_interval - self.loop.time()) if self.resync_interval else None
+            try:
+                await asyncio.wait_for(self.changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            self.changed.clear()
+            # Time-based, not "after a quiet spell": during a registration spike local
+            # increments never stop, and other workers' rows would never show up
+            if self.resync_interval and self.loop.time() - last_resync >= self.resync_interval:
+                last_resync = self.loop.time()
+                if self.subscribers:
+                    await run_in_threadpool(self.load, engine)
+            if self.count != published:
+                published = self.count
+                for subscriber in list(self.subscribers):
+                    if subscriber.full():
+                        subscriber.get_nowait() # Replace the unsent value instead of queueing behind it
+                    subscriber.put_nowait(published)
+            await asyncio.sleep(self.min_interval) # Coalesce bursts into one update
+
+    def metrics(self):
+        return ["# HELP mfi_registrations_live Registration count as currently published to pages.",
+                "# TYPE mfi_registrations_live gauge",
+                f"mfi_registrations_live {self.count}",
+                "# HELP mfi_sse_subscribers Open Server-Sent Events connections.",
+                "# TYPE mfi_sse_subscribers gauge",
+                f"mfi_sse_subscribers {len(self.subscribers)}"]
+
+registration_counter = RegistrationCounter(
+    min_interval=float(os.getenv("MFI_COUNT_MIN_INTERVAL_MS", "250")) / 1000,
+    resync_interval=float(os.getenv("MFI_COUNT_RESYNC_S", "60")),
+    max_subscribers=int(os.getenv("MFI_SSE_MAX_CLIENTS", "10000")),
+)
+metric_collectors.append(registration_counter.metrics)
+SSE_HEARTBEAT = 15 # Seconds; keeps idle connections alive through proxies
+
+# Enabled by MFI_BATCH_WRITES, read with the engine settings above
+batch_writer = ParticipantBatchWriter(
+    max_batch=int(os.getenv("MFI_BATCH_SIZE", "100")),
+    max_wait=int(os.getenv("MFI_BATCH_WAIT_MS", "5")) / 1000,
+) if USE_BATCH_WRITES else None
+
+async def save_participant(participant: OnlineParticipant):
+    """Inserts a participant without blocking the event loop.
+
+    Raises IntegrityError or DuplicateEmailError when the email is already registered.
+    """
+    if participant.email in registered_emails:
+        raise DuplicateEmailError(participant.email)
+    try:
+        participant = await _insert_participant(participant)
+    except DuplicateEmailError:
+        registered_emails.add(participant.email) # The database knows it; remember for next time
+        raise
+    except IntegrityError as e:
+        if is_duplicate_email(e): # Other violations (e.g. a missing column) say nothing about the email
+            registered_emails.add(participant.email)
+        raise
+    registered_emails.add(participant.email)
+    return participant
+
+def _insert_participant_job(values):
+    """Writer-thread job: inserts one participant and its outbox row; returns the new id or None."""
+    def job(conn):
+        stmt, outbox_stmt = participant_insert_statements("sqlite", [values])
+        rows = conn.execute(stmt).all()
+        if rows:
+            conn.execute(outbox_stmt(rows))
+        return rows[0][0] if rows else None
+    return job
+
+async def _insert_participant(participant):
+    if sqlite_writer is not None:
+        participant_id = await sqlite_writer.run(_insert_participant_job(participant.model_dump(exclude={"id"})))
+        if participant_id is None:
+            raise DuplicateEmailError(participant.email)
+        participant.id = participant_id
+        return participant
+    if batch_writer is not None:
+        return await batch_writer.submit(participant)
+    if async_engine is None:
+        return await run_in_threadpool(_save_participant_sync, participant)
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        session.add(participant)
+        await session.flush() # Assigns participant.id for the outbox row
+        session.add(EmailOutbox(**registration_email(participant.id, participant.name, participant.email)))
+        with db_time.time("commit"):
+            await session.commit()
+        with db_time.time("refresh"):
+            await session.refresh(participant)
+    return participant
+
+class IdempotencyCache:
+    """Bounded, process-local memory of recent registration responses by idempotency key.
+
+    A replayed key gets the stored response back. A replay that arrives while the
+    first submit is still running waits for that result instead of racing it.
+    """
+    def __init__(self, ttl, max_entries):
+        self.ttl, self.max_entries = ttl, max_entries
+        self.entries = OrderedDict() # key -> (expires_at, future), oldest first
+
+    def claim(self, key):
+        """Returns (future, owner); the owner must produce the response and `resolve` it."""
+        now = time.monotonic()
+        while self.entries and next(iter(self.entries.values()))[0] <= now:
+            self.entries.popitem(last=False) # Same TTL for every entry, so expired ones are at the front
+        if key in self.entries:
+            return self.entries[key][1], False
+        future = asyncio.get_running_loop().create_future()
+        self.entries[key] = (now + self.ttl, future)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return future, True
+
+    def resolve(self, key, future, response):
+        """Publishes the owner's response; None (not replayable) forgets the key so a retry runs again."""
+        if response is None and self.entries.get(key, (None, None))[1] is future:
+            del self.entries[key]
+        future.set_result(response)
+
+idempotency_cache = IdempotencyCache(
+    ttl=float(os.getenv("MFI_IDEMPOTENCY_TTL_S", "600")),
+    max_entries=int(os.getenv("MFI_IDEMPOTENCY_MAX_KEYS", "10000")),
+)
+idempotent_replays = Counter("mfi_idempotent_replays_total", "Registration submits answered from the idempotency cache.")
+metric_collectors.append(idempotent_replays.render)
 
-            # --- RETURN CONFIRMATION STEP ---
-            # This replaces the form inside the modal
-            confirmation_step = Div(id="modal-content", cls="flex flex-col justify-center content-center text-center gap-y-4")( # Target same ID
-                H3("Confirm", cls="font-heading text-2xl text-[#004552] mb-4"),
-                P("You will be receiving a meeting link on the email id that you provided.",
-                  cls="font-rest text-gray-700 mb-6"),
-                primary_button( # Use the helper for styling
-                    "Confirm",
-                    hx_get=f"/registration-confirmed?name={participant.name}&email={participant.email}", # Pass name for final message
-                    hx_target="#modal-content",  # Target same content area
-                    hx_swap="innerHTML"         # Replace confirmation with success message
-                ),
-                Button(  # Use standard secondary/gray button style
-                    "Cancel",
-                    cls="bg-gray-200 hover:bg-gray-300 text-gray-700 font-medium p-2 rounded-md transition duration-300",
-                    hx_get="/close-modal",
-                    hx_target="#join-modal-container",
-                    hx_swap="delete"  # Close modal directly
-                )
-            )
-            return confirmation_step
-            # --- END CONFIRMATION STEP ---
-
-    except IntegrityError:
-        return registration_error_message("An account with this email address already exists.")
+@rt("/participants/online")
+async def add_online_participant(participant: OnlineParticipant, idempotency_key: str = ""):
+    """Handles submission, saves data, and returns the confirmation step.
+
+    Resubmits carrying the same idempotency key (and email) get the first response
+    back without touching the database.
+    """
+    if not idempotency_key:
+        return (await register_participant(participant))[0]
+    key = (idempotency_key[:64], participant.email)
+    future, owner = idempotency_cache.claim(key)
+    if not owner:
+        response = await asyncio.shield(future)
+        if response is not None:
+            idempotent_replays.inc()
+            return response
+        return (await register_participant(participant))[0] # The first attempt failed; this one is a real retry
+
+    response, ok = None, False
+    try:
+        response, ok = await register_participant(participant)
+    finally:
+        idempotency_cache.resolve(key, future, response if ok else None)
+    return response
+
+async def register_participant(participant):
+    """Saves the participant (or spools it during an outage); returns (response, succeeded)."""
+    spooled = False
+    try:
+        participant = await save_participant(participant)
+    except (IntegrityError, DuplicateEmailError):
+        return registration_error_message("An account with this email address already exists."), False
+    except DB_UNAVAILABLE_ERRORS as e:
+        if registration_spool is None:
+            logging.error(f"Error saving participant: {e}")
+            return registration_error_message("Something went wrong. Please try again later."), False
+        try:
+            await run_in_threadpool(registration_spool.append, participant)
+        except OSError as spool_error:
+            logging.error(f"Error saving participant: {e}; spooling failed too: {spool_error}")
+            return registration_error_message("Something went wrong. Please try again later."), False
+        logging.warning(f"Database unavailable, spooled registration for replay: {e}")
+        spooled = True
     except Exception as e:
         logging.error(f"Error saving participant: {e}")
-        return registration_error_message("Something went wrong. Please try again later.")
+        return registration_error_message("Something went wrong. Please try again later."), False
+    if not spooled: # Spooled signups are counted when the replayer inserts them
+        registration_counter.increment()
+
+    # --- RETURN CONFIRMATION STEP ---
+    # This replaces the form inside the modal
+    return confirmation_step(participant.name, participant.email), True
+    # --- END CONFIRMATION STEP ---
 
 @rt("/registration-confirmed")
 def show_confirmation(name: str = "Participant", email: str = "your email"): # Add email parameter
@@ -807,9 +2606,426 @@ def faq_page():
 
 @rt("/close-modal")
 def close_modal():
-    """Route to handle closing the modal. Returns empty response because HTMX handles deletion."""
+    """Route to handle closing the modal. Returns empty response because HTMX handles deletion.
+
+    The modal now closes client-side (closeJoinModal); kept for pages still open from before that change."""
     return "" # Return empty string, HTMX swap="delete" handles removal
 
+@rt("/events/registrations")
+async def registration_events():
+    """Server-Sent Events stream of the live registration count."""
+    subscriber = registration_counter.subscribe()
+    if subscriber is None:
+        return Response("Too many live connections", status_code=503, headers={"Retry-After": "30"})
+
+    async def stream():
+        try:
+            yield "retry: 10000\n\n" # Reconnect gently after a deploy instead of all at once
+            while True:
+                try:
+                    count = await asyncio.wait_for(subscriber.get(), SSE_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: count\ndata: {count}\n\n"
+        finally:
+            registration_counter.unsubscribe(subscriber)
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-store", "X-Accel-Buffering": "no"})
+
+def _pool_metrics():
+    lines = ["# HELP mfi_db_pool_checked_out Connections currently checked out of the pool.",
+             "# TYPE mfi_db_pool_checked_out gauge",
+             f'mfi_db_pool_checked_out{{engine="sync"}} {engine.pool.checkedout()}']
+    if async_engine is not None:
+        lines.append(f'mfi_db_pool_checked_out{{engine="async"}} {async_engine.sync_engine.pool.checkedout()}')
+    return lines
+
+def _fragment_cache_metrics():
+    lines = ["# HELP mfi_fragment_cache_lookups_total Fragment cache lookups by component and result.",
+             "# TYPE mfi_fragment_cache_lookups_total counter"]
+    for name, info in fragment_cache_stats().items():
+        lines.append(f'mfi_fragment_cache_lookups_total{{component="{name}",result="hit"}} {info["hits"]}')
+        lines.append(f'mfi_fragment_cache_lookups_total{{component="{name}",result="miss"}} {info["misses"]}')
+    return lines
+
+metric_collectors += [_pool_metrics, _fragment_cache_metrics]
+
+@rt("/metrics")
+def get_metrics():
+    """Prometheus scrape endpoint."""
+    return Response(merged_metrics() if METRICS_DIR else render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+# --- Admin Routes ---
+# Protected by a shared bearer token from MFI_ADMIN_TOKEN; with no token set they are disabled.
+
+ADMIN_TOKEN = os.getenv("MFI_ADMIN_TOKEN", "")
+
+def admin_denied(req):
+    """Returns an error Response unless the request carries the admin bearer token."""
+    if not ADMIN_TOKEN:
+        return Response("Admin routes are disabled (MFI_ADMIN_TOKEN not set)", status_code=404)
+    scheme, _, token = req.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(token.strip().encode(), ADMIN_TOKEN.encode()):
+        return Response("Unauthorized", status_code=401, headers={"WWW-Authenticate": "Bearer"})
+    return None
+
+EXPORT_COLUMNS = ("id", "name", "address", "email", "phone", "created_at")
+EXPORT_CHUNK_SIZE = 1000
+
+def iter_participant_rows(since=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yields participant rows in (created_at, id) order through a server-side cursor.
+
+    Only one chunk is held in memory at a time, however large the table is.
+    """
+    table = OnlineParticipant.__table__
+    query = select(*(table.c[name] for name in EXPORT_COLUMNS)).order_by(table.c.created_at, table.c.id)
+    if since is not None:
+        query = query.where(table.c.created_at >= since)
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=chunk_size).execute(query)
+        for chunk in result.partitions():
+            yield chunk
+
+def _csv_export(rows):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(EXPORT_COLUMNS)
+    yield buf.getvalue()
+    for chunk in rows:
+        buf.seek(0)
+        buf.truncate()
+        writer.writerows(chunk)
+        yield buf.getvalue()
+
+def _ndjson_export(rows):
+    for chunk in rows:
+        yield "".join(json.dumps(dict(zip(EXPORT_COLUMNS, row)), default=str) + "\n" for row in chunk)
+
+EXPORT_FORMATS = {
+    "csv": (_csv_export, "text/csv; charset=utf-8"),
+    "ndjson": (_ndjson_export, "application/x-ndjson"),
+}
+
+@rt("/admin/participants/export")
+def export_participants(req, fmt: str = "csv", since: str = ""):
+    """Streams online_participants as CSV or NDJSON, optionally only rows created since `since` (ISO 8601)."""
+    if denied := admin_denied(req):
+        return denied
+    if fmt not in EXPORT_FORMATS:
+        return Response(f"Unknown format '{fmt}', expected one of: {', '.join(EXPORT_FORMATS)}", status_code=400)
+    try:
+        since_dt = datetime.fromisoformat(since) if since else None
+    except ValueError:
+        return Response("`since` must be an ISO 8601 timestamp", status_code=400)
+
+    render, media_type = EXPORT_FORMATS[fmt]
+    filename = f"participants-{datetime.now():%Y%m%dT%H%M%S}.{fmt}"
+    return StreamingResponse(render(iter_participant_rows(since_dt)), media_type=media_type,
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+SEARCH_PAGE_SIZE = 50
+SEARCH_MAX_PAGE_SIZE = 200
+
+def encode_cursor(created_at, participant_id):
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{participant_id}".encode()).decode()
+
+def decode_cursor(cursor):
+    created_at, _, participant_id = base64.urlsafe_b64decode(cursor.encode()).decode().partition("|")
+    return datetime.fromisoformat(created_at), int(participant_id)
+
+ASCII_LOWER = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz")
+
+def prefix_upper_bound(prefix):
+    """The smallest string above every string that starts with `prefix`, or None if there is none."""
+    stem = prefix.rstrip("\U0010ffff") # The last code point can't be incremented; carry into the one before
+    if not stem:
+        return None
+    code = ord(stem[-1]) + 1
+    if 0xD800 <= code <= 0xDFFF: # Surrogates can't be encoded; the next real character is U+E000
+        code = 0xE000
+    return stem[:-1] + chr(code)
+
+def prefix_match(column, prefix, dialect):
+    """Case-insensitive `column` starts-with `prefix`, written so the lower() index can serve it.
+
+    Postgres folds case for all of Unicode. SQLite's lower() only folds ASCII, so there
+    the query is folded the same way: "Él" finds "Élodie", but "él" does not.
+    """
+    expr = func.lower(column)
+    if dialect == "postgresql":
+        prefix = prefix.lower()
+        escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        return expr.like(escaped + "%", escape="\\")
+    # SQLite only applies its LIKE optimisation to plain columns; a range works on expression indexes
+    prefix = prefix.translate(ASCII_LOWER)
+    upper = prefix_upper_bound(prefix)
+    return expr >= prefix if upper is None else and_(expr >= prefix, expr < upper)
+
+def search_participants(q="", after=None, limit=SEARCH_PAGE_SIZE):
+    """Returns one page of participants whose name or email starts with `q`, oldest first.
+
+    Pages continue from the (created_at, id) of the last row seen instead of using
+    OFFSET, so page 1000 costs the same as page 1.
+    """
+    table = OnlineParticipant.__table__
+    query = (select(*(table.c[name] for name in EXPORT_COLUMNS))
+             .order_by(table.c.created_at, table.c.id).limit(limit))
+    if q:
+        query = query.where(or_(prefix_match(table.c.email, q, engine.dialect.name),
+                                prefix_match(table.c.name, q, engine.dialect.name)))
+    if after is not None:
+        # Row-value comparison so both databases seek straight into the (created_at, id) index
+        query = query.where(tuple_(table.c.created_at, table.c.id) > tuple_(*after))
+    with db_time.time("search"), engine.connect() as conn:
+        return conn.execute(query).all()
+
+@rt("/admin/participants/search")
+def admin_search_participants(req, q: str = "", after: str = "", limit: int = SEARCH_PAGE_SIZE):
+    """Prefix search on name or email. Pass the returned `next` back as `after` for the following page."""
+    if denied := admin_denied(req):
+        return denied
+    try:
+        cursor = decode_cursor(after) if after else None
+    except (ValueError, UnicodeDecodeError):
+        return Response("Invalid `after` cursor", status_code=400)
+    limit = max(1, min(limit, SEARCH_MAX_PAGE_SIZE))
+
+    rows = search_participants(q.strip(), cursor, limit)
+    results = [{name: (value.isoformat() if isinstance(value, datetime) else value)
+                for name, value in zip(EXPORT_COLUMNS, row)} for row in rows]
+    next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id) if len(rows) == limit else None
+    return JSONResponse({"results": results, "next": next_cursor})
+
+@rt("/admin/cache/invalidate", methods=["post"])
+def invalidate_page_cache(req):
+    """Drops every cached page, in all workers, so the next request renders it afresh."""
+    if denied := admin_denied(req):
+        return denied
+    if LAUNCHER_PID:
+        os.kill(LAUNCHER_PID, signal.SIGUSR1) # Fans out to every worker, this one included
+        return JSONResponse({"invalidated": "all workers"})
+    page_cache.invalidate()
+    return JSONResponse({"invalidated": "this process"})
+
+# --- Bulk Import ---
+# Partner spreadsheets are loaded in chunks: COPY into a temp table on Postgres, a
+# single executemany on SQLite, and ON CONFLICT (email) DO NOTHING in both cases so
+# duplicates are skipped in bulk rather than failing row by row.
+
+IMPORT_CHUNK_SIZE = 5000
+IMPORT_COLUMNS = ("name", "address", "email", "phone", "created_at")
+MAX_REPORTED_ERRORS = 20
+
+def _validate_import_row(row):
+    """Returns (values, None) for a usable CSV row, or (None, reason) if it must be skipped."""
+    row = {(k or "").strip().lower(): (v or "").strip() for k, v in row.items()}
+    missing = [field for field in ("name", "email", "phone") if not row.get(field)]
+    if missing:
+        return None, f"missing {', '.join(missing)}"
+    if "@" not in row["email"] or " " in row["email"]:
+        return None, f"invalid email '{row['email']}'"
+    return {"name": row["name"], "address": row.get("address") or None, "email": row["email"],
+            "phone": row["phone"], "created_at": datetime.now()}, None
+
+def _copy_chunk(conn, rows):
+    """Postgres: COPY the chunk into a temp table, then insert the new emails in one statement."""
+    buf = io.StringIO()
+    csv.writer(buf).writerows([[row[c] for c in IMPORT_COLUMNS] for row in rows])
+    buf.seek(0)
+    cursor = conn.connection.cursor()
+    cursor.execute("CREATE TEMP TABLE participant_import (name text, address text, email text, phone text, "
+                   "created_at timestamp) ON COMMIT DROP")
+    cursor.copy_expert("COPY participant_import (name, address, email, phone, created_at) FROM STDIN WITH (FORMAT csv)", buf)
+    cursor.execute("INSERT INTO online_participants (name, address, email, phone, created_at) "
+                   "SELECT name, address, email, phone, created_at FROM participant_import "
+                   "ON CONFLICT (email) DO NOTHING")
+    return cursor.rowcount
+
+def _executemany_chunk(conn, rows):
+    table = OnlineParticipant.__table__
+    stmt = sqlite_insert(table).on_conflict_do_nothing(index_elements=[table.c.email])
+    return conn.execute(stmt, rows).rowcount
+
+def import_participants(lines, db_engine=None, chunk_size=IMPORT_CHUNK_SIZE):
+    """Bulk-loads participants from CSV text (an iterable of lines, header row first).
+
+    Returns counts of inserted, duplicate (already registered or repeated in the file)
+    and invalid rows, plus the first few validation errors by line number.
+    """
+    db_engine = db_engine or engine
+    write_chunk = _copy_chunk if db_engine.dialect.name == "postgresql" else _executemany_chunk
+    summary = {"inserted": 0, "duplicate": 0, "invalid": 0, "errors": []}
+    seen = set()
+
+    def valid_rows():
+        for line_no, row in enumerate(csv.DictReader(lines), start=2): # Line 1 is the header
+            values, error = _validate_import_row(row)
+            if error:
+                summary["invalid"] += 1
+                if len(summary["errors"]) < MAX_REPORTED_ERRORS:
+                    summary["errors"].append(f"line {line_no}: {error}")
+            elif values["email"] in seen or values["email"] in registered_emails:
+                summary["duplicate"] += 1
+            else:
+                seen.add(values["email"])
+                yield values
+
+    rows = valid_rows()
+    while chunk := list(itertools.islice(rows, chunk_size)):
+        with db_engine.begin() as conn:
+            inserted = write_chunk(conn, chunk)
+        summary["inserted"] += inserted
+        summary["duplicate"] += len(chunk) - inserted
+        for row in chunk: # Inserted or already present, every email in the chunk is now registered
+            registered_emails.add(row["email"])
+    return summary
+
+@rt("/admin/participants/import", methods=["post"])
+async def upload_participants(req, file: UploadFile):
+    """Imports an uploaded CSV (columns: name, email, phone, optional address) and returns a JSON summary."""
+    if denied := admin_denied(req):
+        return denied
+    text = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    try:
+        summary = await run_in_threadpool(import_participants, text)
+    except (UnicodeDecodeError, csv.Error) as e:
+        return Response(f"Could not read CSV: {e}", status_code=400)
+    return summary
+
+# --- Admission Control ---
+# Write routes get a per-IP token bucket (429) and a per-process in-flight limit sized
+# to the connection pool (503). Requests over the limit wait briefly in a bounded
+# queue and are then turned away with Retry-After instead of piling up on the pool.
+
+ADMISSION_PATHS = {"/participants/online", "/admin/participants/import"}
+
+def client_ip(scope):
+    # Behind a proxy, uvicorn (proxy_headers with forwarded_allow_ips, as launch.py runs
+    # it) has already replaced the client with the address the trusted proxy saw. Never
+    # read X-Forwarded-For here: its left-most entries are whatever the client sent.
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+class AdmissionController:
+    def __init__(self, max_in_flight, max_queue, max_wait, ip_rate, ip_burst, max_tracked_ips=10000):
+        self.max_in_flight, self.max_queue, self.max_wait = max_in_flight, max_queue, max_wait
+        self.ip_rate, self.ip_burst, self.max_tracked_ips = ip_rate, ip_burst, max_tracked_ips
+        self.slots = asyncio.Semaphore(max_in_flight)
+        self.in_flight = 0
+        self.waiting = 0
+        self.buckets = OrderedDict() # LRU of per-IP token buckets
+        self.rejected = Counter("mfi_admission_rejected_total", "Write requests turned away by admission control.", ("reason",))
+
+    def ip_bucket(self, ip):
+        bucket = self.buckets.get(ip)
+        if bucket is None:
+            bucket = self.buckets[ip] = TokenBucket(self.ip_rate, self.ip_burst)
+            if len(self.buckets) > self.max_tracked_ips:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(ip)
+        return bucket
+
+    async def acquire(self):
+        """Waits up to max_wait for an in-flight slot; returns False if the request should be shed."""
+        if self.slots.locked() and self.waiting >= self.max_queue:
+            return False
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self.slots.acquire(), self.max_wait)
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        return True
+
+    def release(self):
+        self.in_flight -= 1
+        self.slots.release()
+
+    def metrics(self):
+        gauges = [("mfi_admission_in_flight", "Admitted write requests currently running.", self.in_flight),
+                  ("mfi_admission_queue_depth", "Write requests waiting for an in-flight slot.", self.waiting),
+                  ("mfi_admission_in_flight_limit", "Maximum concurrent write requests per process.", self.max_in_flight),
+                  ("mfi_admission_queue_limit", "Maximum write requests allowed to wait.", self.max_queue)]
+        lines = []
+        for name, help_text, value in gauges:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {value}"]
+        return lines + self.rejected.render()
+
+admission = AdmissionController(
+    max_in_flight=int(os.getenv("MFI_MAX_IN_FLIGHT", str(DB_POOL_SIZE + DB_MAX_OVERFLOW))),
+    max_queue=int(os.getenv("MFI_ADMISSION_QUEUE", str(2 * (DB_POOL_SIZE + DB_MAX_OVERFLOW)))),
+    max_wait=int(os.getenv("MFI_ADMISSION_WAIT_MS", "500")) / 1000,
+    ip_rate=float(os.getenv("MFI_IP_RATE", "1")), # Sustained submissions per second per IP
+    ip_burst=int(os.getenv("MFI_IP_BURST", "10")), # Generous: many users share carrier/office NAT IPs
+)
+metric_collectors.append(admission.metrics)
+
+class AdmissionControlMiddleware:
+    def __init__(self, app, controller):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in ADMISSION_PATHS:
+            return await self.app(scope, receive, send)
+
+        wait = self.controller.ip_bucket(client_ip(scope)).take()
+        if wait > 0:
+            self.controller.rejected.inc("rate_limited")
+            return await self._reject(scope, receive, send, 429, wait,
+                                      "Too many attempts from your network. Please wait a moment and try again.")
+        if not await self.controller.acquire():
+            self.controller.rejected.inc("overloaded")
+            return await self._reject(scope, receive, send, 503, 2,
+                                      "We're seeing a lot of registrations right now. Please try again in a few seconds.")
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release()
+
+    async def _reject(self, scope, receive, send, status, retry_after, message):
+        body = to_xml(registration_error_message(message))
+        resp = HTMLResponse(body, status_code=status, headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
+        await resp(scope, receive, send)
+
 # --- End New Routes ---
-init_db(engine)
+
+startup.lap("routes")
+
+# launch.py runs the schema step once before starting workers and sets this for them
+schema_note = "skipped"
+if os.getenv("MFI_SKIP_SCHEMA_INIT", "").lower() not in ("1", "true", "yes"):
+    schema_note = "created/updated" if init_db(engine) else "unchanged"
+startup.lap("schema")
+
+# The launcher runs the email dispatcher itself, so workers don't compete for the outbox
+RUN_EMAIL_DISPATCHER = os.getenv("MFI_EMAIL_DISPATCHER", "1").lower() in ("1", "true", "yes")
+
+def start_worker():
+    """Per-process startup, run inside each server worker once it is up."""
+    registered_emails.load(engine)
+    registration_counter.load(engine)
+    if email_dispatcher is not None and RUN_EMAIL_DISPATCHER:
+        email_dispatcher.start()
+    if registration_spool is not None:
+        registration_spool.start()
+
+def stop_worker():
+    if registration_spool is not None:
+        registration_spool.stop()
+    if email_dispatcher is not None and RUN_EMAIL_DISPATCHER:
+        email_dispatcher.stop()
+
+app.on_event("startup")(start_worker)
+app.on_event("shutdown")(stop_worker)
+
+app.add_middleware(AdmissionControlMiddleware, controller=admission)
+app.add_middleware(MetricsMiddleware) # Added last so it is outermost and sees every response
+metric_collectors.append(startup.metrics)
+print(f"Startup in {time.perf_counter() - BOOT_STARTED:.2f}s ({startup.summary()}; schema {schema_note})")
 serve()
\ No newline at end of file
@@ -0,0 +1,31 @@
+"""ParticipantBatchWriter keeps serving registrations after a caller goes away."""
+import asyncio
+import os
+import sys
+import tempfile
+import uuid
+
+# main.py reads its configuration at import time
+os.environ["POSTGRES_MFI"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'batch_writer.db')}"
+os.environ["MFI_BATCH_WRITES"] = "1"
+os.environ["MFI_SQLITE_PROFILE"] = "0"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+
+
+def participant():
+    return main.OnlineParticipant(name="Test User", email=f"{uuid.uuid4().hex}@example.com", phone="9999999999", address="")
+
+
+def test_cancelled_waiter_does_not_stop_the_flusher():
+    async def scenario():
+        writer = main.batch_writer
+        cancelled = asyncio.create_task(writer.submit(participant()))
+        await asyncio.sleep(0) # Let it reach the queue
+        cancelled.cancel()
+        saved = await asyncio.wait_for(writer.submit(participant()), timeout=5)
+        assert saved.id is not None
+        assert not writer.task.done()
+
+    asyncio.run(scenario())